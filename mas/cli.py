@@ -31,6 +31,11 @@ def main() -> None:
             "Path to run log file. If omitted, writes to logs/mas_run_<timestamp>.log."
         ),
     )
+    parser.add_argument(
+        "--quiet-trace",
+        action="store_true",
+        help="Print only tool names in the tool trace instead of full args and observations.",
+    )
     args = parser.parse_args()
 
     db = build_db_from_env()
@@ -40,8 +45,8 @@ def main() -> None:
 
     try:
         if args.mode == "interactive":
-            run_interactive(agent, stream_agent, history, logger=logger)
+            run_interactive(agent, stream_agent, history, logger=logger, verbose=not args.quiet_trace)
         else:
-            run_demo_queries(agent, stream_agent, history, logger=logger)
+            run_demo_queries(agent, stream_agent, history, logger=logger, verbose=not args.quiet_trace)
     finally:
         logger.close()
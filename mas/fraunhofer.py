@@ -224,6 +224,9 @@ _KEY_CUSTOMER_VALUE: List[str] = [
 ]
 
 
+_AREA_KEYS_MSG = ", ".join(sorted(_SERVICE_AREAS.keys()))
+
+
 def _normalize_key(value: str) -> str:
     return (value or "").strip().lower().replace("-", "_").replace(" ", "_")
 
@@ -231,9 +234,9 @@ def _normalize_key(value: str) -> str:
 def _safe_area_lookup(area: str) -> Dict[str, Any]:
     key = _normalize_key(area)
     if not key:
-        raise ValueError("Missing area. Use one of: " + ", ".join(sorted(_SERVICE_AREAS.keys())))
+        raise ValueError(f"Missing area. Use one of: {_AREA_KEYS_MSG}")
     if key not in _SERVICE_AREAS:
-        raise ValueError(f"Unknown area '{area}'. Use one of: " + ", ".join(sorted(_SERVICE_AREAS.keys())))
+        raise ValueError(f"Unknown area '{area}'. Use one of: {_AREA_KEYS_MSG}")
     return _SERVICE_AREAS[key]
 
 
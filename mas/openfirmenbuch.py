@@ -1,17 +1,38 @@
+import copy
 import datetime as dt
 import json
 import os
+import threading
+import time
 import urllib.error
 import urllib.request
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
 
 OPENFIRMENBUCH_BASE_URL = "https://api.openfirmenbuch.at"
 OPENFIRMENBUCH_TIMEOUT_SECONDS = int(os.getenv("OPENFIRMENBUCH_TIMEOUT_SECONDS", "30"))
+OPENFIRMENBUCH_EXTRACT_CACHE_TTL_SECONDS = int(os.getenv("OPENFIRMENBUCH_EXTRACT_CACHE_TTL_SECONDS", "3600"))
+OPENFIRMENBUCH_EXTRACT_CACHE_MAXSIZE = 512
+
+# (fnr, stichtag, umfang) -> (stored_at, cached extract). Bounded LRU with a TTL on every entry.
+_EXTRACT_CACHE: "OrderedDict[Tuple[str, str, str], Tuple[float, CachedExtract]]" = OrderedDict()
+_EXTRACT_CACHE_LOCK = threading.Lock()
+
+# Shared read-only fallback for missing nested blocks; never mutate.
+_EMPTY: Dict[str, Any] = {}
 
 
 def _ofb_post_json(path: str, payload: Dict[str, Any]) -> Any:
     url = f"{OPENFIRMENBUCH_BASE_URL}{path}"
-    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
     req = urllib.request.Request(
         url=url,
         data=body,
@@ -19,22 +40,203 @@ def _ofb_post_json(path: str, payload: Dict[str, Any]) -> Any:
         method="POST",
     )
     with urllib.request.urlopen(req, timeout=OPENFIRMENBUCH_TIMEOUT_SECONDS) as response:
-        raw = response.read().decode("utf-8")
-    return json.loads(raw)
+        if orjson is not None:
+            return orjson.loads(response.read())
+        return json.load(response)
+
+
+def _extract_cache_get(key: Tuple[str, str, str]) -> Optional["CachedExtract"]:
+    with _EXTRACT_CACHE_LOCK:
+        entry = _EXTRACT_CACHE.get(key)
+        if entry is None:
+            return None
+        stored_at, extract = entry
+        if time.monotonic() - stored_at > OPENFIRMENBUCH_EXTRACT_CACHE_TTL_SECONDS:
+            del _EXTRACT_CACHE[key]
+            return None
+        _EXTRACT_CACHE.move_to_end(key)
+        return extract
+
+
+def _extract_cache_put(key: Tuple[str, str, str], extract: "CachedExtract") -> None:
+    with _EXTRACT_CACHE_LOCK:
+        _EXTRACT_CACHE[key] = (time.monotonic(), extract)
+        _EXTRACT_CACHE.move_to_end(key)
+        while len(_EXTRACT_CACHE) > OPENFIRMENBUCH_EXTRACT_CACHE_MAXSIZE:
+            _EXTRACT_CACHE.popitem(last=False)
 
 
 def _as_list(value: Any) -> List[Any]:
     return value if isinstance(value, list) else []
 
 
+def _dget(data: Dict[str, Any], key: str) -> Dict[str, Any]:
+    value = data.get(key)
+    return value if isinstance(value, dict) else _EMPTY
+
+
 def _pick_active(records: Any) -> Optional[Dict[str, Any]]:
+    first: Optional[Dict[str, Any]] = None
     for item in _as_list(records):
-        if isinstance(item, dict) and item.get("AUFRECHT") is True:
-            return item
-    for item in _as_list(records):
-        if isinstance(item, dict):
+        if not isinstance(item, dict):
+            continue
+        if item.get("AUFRECHT") is True:
             return item
-    return None
+        if first is None:
+            first = item
+    return first
+
+
+def _parse_profile(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Raises AttributeError/TypeError on malformed FIRMA blocks."""
+    firma = data.get("FIRMA") or _EMPTY
+    name_block = _pick_active(firma.get("FI_DKZ02")) or _EMPTY
+    address_block = _pick_active(firma.get("FI_DKZ03")) or _EMPTY
+    seat_block = _pick_active(firma.get("FI_DKZ06")) or _EMPTY
+    legal_block = _pick_active(firma.get("FI_DKZ07")) or _EMPTY
+    name_lines = name_block.get("BEZEICHNUNG", [])
+    return {
+        "ok": True,
+        "fnr": data.get("FNR"),
+        "stichtag": data.get("STICHTAG"),
+        "name_lines": name_lines,
+        "name": " ".join(name_lines).strip(),
+        "seat": seat_block.get("SITZ"),
+        "ortnr": (seat_block.get("ORTNR") or _EMPTY).get("CODE"),
+        "address": {
+            "strasse": address_block.get("STRASSE"),
+            "hausnummer": address_block.get("HAUSNUMMER"),
+            "plz": address_block.get("PLZ"),
+            "ort": address_block.get("ORT"),
+            "staat": address_block.get("STAAT"),
+        },
+        "legal_form": legal_block.get("RECHTSFORM") or {},
+        "abfragezeitpunkt": data.get("ABFRAGEZEITPUNKT"),
+        "pruefsumme": data.get("PRUEFSUMME"),
+    }
+
+
+def _parse_roles(data: Dict[str, Any]) -> Dict[str, Any]:
+    person_by_pnr: Dict[str, Dict[str, Any]] = {}
+    for person in _as_list(data.get("PER")):
+        if not isinstance(person, dict):
+            continue
+        pnr = str(person.get("PNR") or "").strip()
+        if not pnr:
+            continue
+        person_identity = _pick_active(person.get("PE_DKZ02")) or _EMPTY
+        person_by_pnr[pnr] = {
+            "pnr": pnr,
+            "name_formatiert": person_identity.get("NAME_FORMATIERT", []),
+            "vorname": person_identity.get("VORNAME"),
+            "nachname": person_identity.get("NACHNAME"),
+            "geburtsdatum": person_identity.get("GEBURTSDATUM"),
+        }
+
+    roles: List[Dict[str, Any]] = []
+    for fun in _as_list(data.get("FUN")):
+        if not isinstance(fun, dict):
+            continue
+        pnr = str(fun.get("PNR") or "").strip()
+        authority_block = _pick_active(fun.get("FU_DKZ10")) or _EMPTY
+        roles.append(
+            {
+                "pnr": pnr or None,
+                "role_code": fun.get("FKEN"),
+                "role_text": fun.get("FKENTEXT"),
+                "person": person_by_pnr.get(pnr),
+                "representation_type": (authority_block.get("VART") or {}),
+                "representation_text": authority_block.get("TXTVERTR", []),
+                "effective_from": authority_block.get("DATVON"),
+                "effective_to": authority_block.get("DATBIS"),
+                "active": authority_block.get("AUFRECHT"),
+                "vnr": authority_block.get("VNR"),
+            }
+        )
+    return {
+        "ok": True,
+        "fnr": data.get("FNR"),
+        "stichtag": data.get("STICHTAG"),
+        "count": len(roles),
+        "roles": roles,
+    }
+
+
+def _copy1(value: Any) -> Any:
+    # One-level copy of a dict/list pulled from the cached response; scalars pass through.
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _copy_role(role: Dict[str, Any]) -> Dict[str, Any]:
+    person = role["person"]
+    if person is not None:
+        person = dict(person, name_formatiert=_copy1(person["name_formatiert"]))
+    return dict(
+        role,
+        person=person,
+        representation_type=_copy1(role["representation_type"]),
+        representation_text=_copy1(role["representation_text"]),
+    )
+
+
+class CachedExtract:
+    """Raw `/firmenbuch/auszug` response as cached; profile and roles are derived on first use and kept.
+
+    Parsing is lazy so a malformed FIRMA block only affects the profile tool, never the raw extract.
+    """
+
+    __slots__ = ("raw", "_profile", "_roles")
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self.raw = raw
+        self._profile: Optional[Dict[str, Any]] = None
+        self._roles: Optional[Dict[str, Any]] = None
+
+    # Callers get fresh containers: the parsed results stay shared across calls and must not be mutated.
+    def profile(self) -> Dict[str, Any]:
+        if self._profile is None:
+            self._profile = _parse_profile(self.raw)
+        profile = self._profile
+        return dict(
+            profile,
+            name_lines=_copy1(profile["name_lines"]),
+            address=dict(profile["address"]),
+            legal_form=_copy1(profile["legal_form"]),
+        )
+
+    def roles(self) -> Dict[str, Any]:
+        if self._roles is None:
+            self._roles = _parse_roles(self.raw)
+        roles = self._roles
+        return dict(roles, roles=[_copy_role(role) for role in roles["roles"]])
+
+
+def _load_extract(fnr: str, stichtag: str, umfang: str) -> Dict[str, Any]:
+    cleaned_fnr = (fnr or "").strip()
+    if not cleaned_fnr:
+        return {"ok": False, "error": "Missing fnr"}
+    chosen_stichtag = (stichtag or dt.date.today().isoformat()).strip()
+    payload = {"FNR": cleaned_fnr, "STICHTAG": chosen_stichtag, "UMFANG": (umfang or "Kurzinformation").strip()}
+    cache_key = (cleaned_fnr, chosen_stichtag, payload["UMFANG"])
+    try:
+        extract = _extract_cache_get(cache_key)
+        if extract is None:
+            response = _ofb_post_json("/firmenbuch/auszug", payload)
+            if not isinstance(response, dict):
+                return {"ok": False, "error": "Unexpected API response format"}
+            extract = CachedExtract(response)
+            _extract_cache_put(cache_key, extract)
+        return {"ok": True, "request": payload, "extract": extract}
+    except urllib.error.HTTPError as exc:
+        return {"ok": False, "error": f"HTTP {exc.code}: {exc.reason}"}
+    except urllib.error.URLError as exc:
+        return {"ok": False, "error": f"Network error: {exc.reason}"}
+    except Exception as exc:
+        return {"ok": False, "error": str(exc)}
 
 
 def ofb_search_company_compressed(
@@ -67,9 +269,11 @@ def ofb_search_company_compressed(
         response = _ofb_post_json("/firmenbuch/suche/firma/compressed", payload)
         results = _as_list(response.get("ERGEBNIS") if isinstance(response, dict) else [])
         compact: List[Dict[str, Any]] = []
-        for row in results[:safe_limit]:
+        for row in results:
             if not isinstance(row, dict):
                 continue
+            if len(compact) >= safe_limit:
+                break
             compact.append(
                 {
                     "fnr": row.get("fnr"),
@@ -106,38 +310,29 @@ def ofb_get_register_extract(
     """
     Fetch a structured Firmenbuch register extract via `/firmenbuch/auszug` for a given company and date.
     """
-    cleaned_fnr = (fnr or "").strip()
-    if not cleaned_fnr:
-        return {"ok": False, "error": "Missing fnr"}
-    chosen_stichtag = (stichtag or dt.date.today().isoformat()).strip()
-    payload = {"FNR": cleaned_fnr, "STICHTAG": chosen_stichtag, "UMFANG": (umfang or "Kurzinformation").strip()}
-    try:
-        response = _ofb_post_json("/firmenbuch/auszug", payload)
-        if not isinstance(response, dict):
-            return {"ok": False, "error": "Unexpected API response format"}
-        if include_raw:
-            return {"ok": True, "request": payload, "data": response}
-        return {
-            "ok": True,
-            "request": payload,
-            "summary": {
-                "fnr": response.get("FNR"),
-                "stichtag": response.get("STICHTAG"),
-                "umfang": response.get("UMFANG"),
-                "abfragezeitpunkt": response.get("ABFRAGEZEITPUNKT"),
-                "pruefsumme": response.get("PRUEFSUMME"),
-                "vollz_count": len(_as_list(response.get("VOLLZ"))),
-                "person_count": len(_as_list(response.get("PER"))),
-                "function_count": len(_as_list(response.get("FUN"))),
-                "euid_count": len(_as_list(response.get("EUID"))),
-            },
-        }
-    except urllib.error.HTTPError as exc:
-        return {"ok": False, "error": f"HTTP {exc.code}: {exc.reason}"}
-    except urllib.error.URLError as exc:
-        return {"ok": False, "error": f"Network error: {exc.reason}"}
-    except Exception as exc:
-        return {"ok": False, "error": str(exc)}
+    result = _load_extract(fnr, stichtag, umfang)
+    if not result.get("ok"):
+        return result
+    payload = result["request"]
+    response = result["extract"].raw
+    if include_raw:
+        # The cached response backs later profile/roles/summary calls; callers get their own copy.
+        return {"ok": True, "request": payload, "data": copy.deepcopy(response)}
+    return {
+        "ok": True,
+        "request": payload,
+        "summary": {
+            "fnr": response.get("FNR"),
+            "stichtag": response.get("STICHTAG"),
+            "umfang": response.get("UMFANG"),
+            "abfragezeitpunkt": response.get("ABFRAGEZEITPUNKT"),
+            "pruefsumme": response.get("PRUEFSUMME"),
+            "vollz_count": len(v) if isinstance(v := response.get("VOLLZ"), list) else 0,
+            "person_count": len(v) if isinstance(v := response.get("PER"), list) else 0,
+            "function_count": len(v) if isinstance(v := response.get("FUN"), list) else 0,
+            "euid_count": len(v) if isinstance(v := response.get("EUID"), list) else 0,
+        },
+    }
 
 
 def ofb_get_financials_multiple(
@@ -159,18 +354,16 @@ def ofb_get_financials_multiple(
         if include_raw:
             return {"ok": True, "request": payload, "rows": rows[:safe_limit]}
         compact_rows: List[Dict[str, Any]] = []
-        for row in rows[:safe_limit]:
+        for row in rows:
             if not isinstance(row, dict):
                 continue
-            bilanz = row.get("bilanzDaten") if isinstance(row.get("bilanzDaten"), dict) else {}
-            guv = row.get("guvDaten") if isinstance(row.get("guvDaten"), dict) else {}
-            kennzahlen = row.get("kennzahlen") if isinstance(row.get("kennzahlen"), dict) else {}
-            bilanz_kennzahlen = (
-                kennzahlen.get("bilanzKennzahlen") if isinstance(kennzahlen.get("bilanzKennzahlen"), dict) else {}
-            )
-            guv_kennzahlen = (
-                kennzahlen.get("guvKennzahlen") if isinstance(kennzahlen.get("guvKennzahlen"), dict) else {}
-            )
+            if len(compact_rows) >= safe_limit:
+                break
+            bilanz = _dget(row, "bilanzDaten")
+            guv = _dget(row, "guvDaten")
+            kennzahlen = _dget(row, "kennzahlen")
+            bilanz_kennzahlen = _dget(kennzahlen, "bilanzKennzahlen")
+            guv_kennzahlen = _dget(kennzahlen, "guvKennzahlen")
             compact_rows.append(
                 {
                     "gjBeginn": row.get("gjBeginn"),
@@ -203,39 +396,14 @@ def ofb_get_company_profile(
     """
     Return a concise company profile distilled from `/firmenbuch/auszug` (name, seat, address, legal form).
     """
-    extract_result = ofb_get_register_extract(fnr=fnr, stichtag=stichtag, umfang=umfang, include_raw=True)
-    if not extract_result.get("ok"):
-        return extract_result
-    data = extract_result.get("data")
-    if not isinstance(data, dict):
+    result = _load_extract(fnr, stichtag, umfang)
+    if not result.get("ok"):
+        return result
+    try:
+        return result["extract"].profile()
+    except (AttributeError, TypeError):
         return {"ok": False, "error": "Unexpected register extract format"}
 
-    firma = data.get("FIRMA") if isinstance(data.get("FIRMA"), dict) else {}
-    name_block = _pick_active(firma.get("FI_DKZ02"))
-    address_block = _pick_active(firma.get("FI_DKZ03"))
-    seat_block = _pick_active(firma.get("FI_DKZ06"))
-    legal_block = _pick_active(firma.get("FI_DKZ07"))
-
-    return {
-        "ok": True,
-        "fnr": data.get("FNR"),
-        "stichtag": data.get("STICHTAG"),
-        "name_lines": (name_block or {}).get("BEZEICHNUNG", []),
-        "name": " ".join((name_block or {}).get("BEZEICHNUNG", [])).strip(),
-        "seat": (seat_block or {}).get("SITZ"),
-        "ortnr": ((seat_block or {}).get("ORTNR") or {}).get("CODE"),
-        "address": {
-            "strasse": (address_block or {}).get("STRASSE"),
-            "hausnummer": (address_block or {}).get("HAUSNUMMER"),
-            "plz": (address_block or {}).get("PLZ"),
-            "ort": (address_block or {}).get("ORT"),
-            "staat": (address_block or {}).get("STAAT"),
-        },
-        "legal_form": ((legal_block or {}).get("RECHTSFORM") or {}),
-        "abfragezeitpunkt": data.get("ABFRAGEZEITPUNKT"),
-        "pruefsumme": data.get("PRUEFSUMME"),
-    }
-
 
 def ofb_get_management_roles(
     fnr: str,
@@ -245,58 +413,10 @@ def ofb_get_management_roles(
     """
     Map management/function entries (FUN) to person records (PER) from `/firmenbuch/auszug`.
     """
-    extract_result = ofb_get_register_extract(fnr=fnr, stichtag=stichtag, umfang=umfang, include_raw=True)
-    if not extract_result.get("ok"):
-        return extract_result
-    data = extract_result.get("data")
-    if not isinstance(data, dict):
-        return {"ok": False, "error": "Unexpected register extract format"}
-
-    per_entries = _as_list(data.get("PER"))
-    person_by_pnr: Dict[str, Dict[str, Any]] = {}
-    for person in per_entries:
-        if not isinstance(person, dict):
-            continue
-        pnr = str(person.get("PNR") or "").strip()
-        if not pnr:
-            continue
-        person_identity = _pick_active(person.get("PE_DKZ02")) or {}
-        person_by_pnr[pnr] = {
-            "pnr": pnr,
-            "name_formatiert": person_identity.get("NAME_FORMATIERT", []),
-            "vorname": person_identity.get("VORNAME"),
-            "nachname": person_identity.get("NACHNAME"),
-            "geburtsdatum": person_identity.get("GEBURTSDATUM"),
-        }
-
-    roles: List[Dict[str, Any]] = []
-    for fun in _as_list(data.get("FUN")):
-        if not isinstance(fun, dict):
-            continue
-        pnr = str(fun.get("PNR") or "").strip()
-        authority_block = _pick_active(fun.get("FU_DKZ10")) or {}
-        roles.append(
-            {
-                "pnr": pnr or None,
-                "role_code": fun.get("FKEN"),
-                "role_text": fun.get("FKENTEXT"),
-                "person": person_by_pnr.get(pnr),
-                "representation_type": (authority_block.get("VART") or {}),
-                "representation_text": authority_block.get("TXTVERTR", []),
-                "effective_from": authority_block.get("DATVON"),
-                "effective_to": authority_block.get("DATBIS"),
-                "active": authority_block.get("AUFRECHT"),
-                "vnr": authority_block.get("VNR"),
-            }
-        )
-
-    return {
-        "ok": True,
-        "fnr": data.get("FNR"),
-        "stichtag": data.get("STICHTAG"),
-        "count": len(roles),
-        "roles": roles,
-    }
+    result = _load_extract(fnr, stichtag, umfang)
+    if not result.get("ok"):
+        return result
+    return result["extract"].roles()
 
 
 def ofb_get_company_report(
@@ -1,4 +1,5 @@
-from typing import Any, Dict
+import re
+from typing import Any, Dict, List, Tuple
 
 
 FRAUNHOFER_LSCM_PROFILE = {
@@ -44,5 +45,28 @@ FRAUNHOFER_LSCM_PROFILE = {
 }
 
 
+def _build_focus_matcher() -> Tuple["re.Pattern[str]", Dict[str, List[int]]]:
+    keyword_areas: Dict[str, List[int]] = {}
+    for idx, area in enumerate(FRAUNHOFER_LSCM_PROFILE["focus_areas"]):
+        for keyword in area["keywords"]:
+            keyword_areas.setdefault(keyword.lower(), []).append(idx)
+    # Lookahead so overlapping keywords ("automatisierung" / "automatisierte verladung") all match in one scan.
+    alternation = "|".join(re.escape(k) for k in sorted(keyword_areas, key=len, reverse=True))
+    return re.compile(f"(?=({alternation}))"), keyword_areas
+
+
+_FOCUS_RE, _FOCUS_KEYWORD_AREAS = _build_focus_matcher()
+
+
 def fraunhofer_lscm_focus() -> Dict[str, Any]:
     return FRAUNHOFER_LSCM_PROFILE
+
+
+def match_focus_areas(text: str) -> List[str]:
+    """Return the names of focus areas whose keywords occur in `text`, in order of first hit."""
+    hits: Dict[int, None] = {}
+    for match in _FOCUS_RE.finditer((text or "").lower()):
+        for idx in _FOCUS_KEYWORD_AREAS[match.group(1)]:
+            hits.setdefault(idx, None)
+    areas = FRAUNHOFER_LSCM_PROFILE["focus_areas"]
+    return [areas[idx]["name"] for idx in hits]
@@ -1,32 +1,102 @@
+import os
+import queue
+import re
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 import dspy
 
 from .utils import extract_links_from_obj, safe_dump
 
+_LOG_DRAIN_MAX_ITEMS = 256
+_LOG_SCRATCH_MAX_BYTES = 128 * 1024
+_LOG_STOP = object()
+_HTTP_RE = re.compile(r"https?://")
+# Hosts sit at the front of a URL; lowercasing a bounded head avoids copying long query strings.
+_LINK_HEAD_CHARS = 64
+_EVI_HOST = "evi.gv.at"
+_WKO_HOST = "firmen.wko.at"
+
 
 class RunLogger:
     def __init__(self, log_path: Optional[str] = None) -> None:
-        path = Path(log_path) if log_path else Path("logs") / f"mas_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+        started = datetime.now()
+        self.started_at = started.isoformat()
+        path = Path(log_path) if log_path else Path("logs") / f"mas_run_{started.strftime('%Y%m%d_%H%M%S')}.log"
         path.parent.mkdir(parents=True, exist_ok=True)
         self.path = path
-        self._fh = path.open("a", encoding="utf-8")
-        self.line(f"[session:start] {datetime.now().isoformat()}")
+        # Raw append-only fd: the writer thread batches bytes itself, so no text/buffered layer.
+        self._fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        # One scratch buffer for streamed chunks, reused for every field and request of the session.
+        self._buf = bytearray()
+        # Callers only enqueue; a single writer thread owns the fd.
+        self._q: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._drain, name="run-logger", daemon=True)
+        self._writer.start()
+        self.line(f"[session:start] {self.started_at}")
         self.line(f"[session:log_file] {self.path}")
 
     def line(self, text: str = "") -> None:
-        self._fh.write(text + "\n")
-        self._fh.flush()
+        self.flush_buf()
+        self._q.put((text + "\n").encode("utf-8"))
 
     def chunk(self, text: str) -> None:
-        self._fh.write(text)
-        self._fh.flush()
+        # Streamed tokens are collected and written once per field via flush_buf().
+        self._buf.extend(text.encode("utf-8"))
+        if len(self._buf) >= _LOG_SCRATCH_MAX_BYTES:
+            self.flush_buf()
+
+    def flush_buf(self) -> None:
+        if not self._buf:
+            return
+        self._q.put(bytes(self._buf))
+        self._buf.clear()
+
+    def flush(self) -> None:
+        # Returns once everything logged so far has been written to the file.
+        self.flush_buf()
+        written = threading.Event()
+        self._q.put(written)
+        while not written.wait(0.5):
+            if not self._writer.is_alive():
+                return
+
+    def _drain(self) -> None:
+        while True:
+            item = self._q.get()
+            parts: List[bytes] = []
+            stop = False
+            written: Optional[threading.Event] = None
+            while True:
+                if item is _LOG_STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    written = item
+                    break
+                parts.append(item)
+                if len(parts) >= _LOG_DRAIN_MAX_ITEMS:
+                    break
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+            if parts:
+                view = memoryview(b"".join(parts))
+                while view:
+                    view = view[os.write(self._fd, view) :]
+            if written is not None:
+                written.set()
+            if stop:
+                return
 
     def close(self) -> None:
         self.line(f"[session:end] {datetime.now().isoformat()}")
-        self._fh.close()
+        self._q.put(_LOG_STOP)
+        self._writer.join()
+        os.close(self._fd)
 
 
 def print_tool_guide(logger: Optional[RunLogger] = None) -> None:
@@ -47,7 +117,7 @@ def print_tool_guide(logger: Optional[RunLogger] = None) -> None:
             logger.line(line)
 
 
-def print_trace(pred: Any, logger: Optional[RunLogger] = None) -> None:
+def print_trace(pred: Any, logger: Optional[RunLogger] = None, verbose: bool = True) -> None:
     lines = ["", "=" * 90, "RESULT", "=" * 90, pred.process_result]
     for line in lines:
         print(line)
@@ -62,35 +132,45 @@ def print_trace(pred: Any, logger: Optional[RunLogger] = None) -> None:
         print(line)
         if logger:
             logger.line(line)
+    steps: Dict[int, Dict[str, Any]] = {}
+    for key, value in traj.items():
+        name, _, idx = key.rpartition("_")
+        if name and idx.isdigit():
+            steps.setdefault(int(idx), {})[name] = value
     i = 0
     while True:
-        thought_key = f"thought_{i}"
-        tool_key = f"tool_name_{i}"
-        args_key = f"tool_args_{i}"
-        obs_key = f"observation_{i}"
-        if thought_key not in traj and tool_key not in traj:
+        step = steps.get(i)
+        if step is None or ("thought" not in step and "tool_name" not in step):
             break
+        if not verbose:
+            # Batch runs skip the pretty-printed args/observations and keep one line per tool call.
+            text = f"[tool] {step.get('tool_name')}"
+            print(text)
+            if logger:
+                logger.line(text)
+            i += 1
+            continue
         step_line = f"\nStep {i + 1}"
         print(step_line)
         if logger:
             logger.line(step_line)
-        if thought_key in traj:
-            text = f"Thought: {traj.get(thought_key)}"
+        if "thought" in step:
+            text = f"Thought: {step['thought']}"
             print(text)
             if logger:
                 logger.line(text)
-        if tool_key in traj:
-            text = f"Tool: {traj.get(tool_key)}"
+        if "tool_name" in step:
+            text = f"Tool: {step['tool_name']}"
             print(text)
             if logger:
                 logger.line(text)
-        if args_key in traj:
-            text = f"Args:\n{safe_dump(traj.get(args_key), max_len=500)}"
+        if "tool_args" in step:
+            text = f"Args:\n{safe_dump(step['tool_args'], max_len=500)}"
             print(text)
             if logger:
                 logger.line(text)
-        if obs_key in traj:
-            obs_dump = safe_dump(traj.get(obs_key), max_len=700)
+        if "observation" in step:
+            obs_dump = safe_dump(step["observation"], max_len=700)
             text = f"Observation:\n{obs_dump}"
             print(text)
             if logger:
@@ -102,43 +182,31 @@ def print_trace(pred: Any, logger: Optional[RunLogger] = None) -> None:
 
 def enrich_final_result_with_links(pred: Any) -> Any:
     traj = getattr(pred, "trajectory", {}) or {}
-    all_links: List[str] = []
-    evi_links: List[str] = []
-    wko_links: List[str] = []
+    # link -> "EVI" / "WKO" / "SRC", classified once and deduplicated in first-seen order.
+    link_kinds: Dict[str, str] = {}
     for key, value in traj.items():
         if not key.startswith("observation_"):
             continue
         for link in extract_links_from_obj(value):
-            all_links.append(link)
-            lower = link.lower()
-            if "evi.gv.at" in lower:
-                evi_links.append(link)
-            elif "firmen.wko.at" in lower:
-                wko_links.append(link)
-
-    def dedupe(vals: List[str]) -> List[str]:
-        out: List[str] = []
-        seen = set()
-        for v in vals:
-            if v in seen:
+            if link in link_kinds:
                 continue
-            seen.add(v)
-            out.append(v)
-        return out
+            head = link[:_LINK_HEAD_CHARS].lower()
+            if _EVI_HOST in head:
+                link_kinds[link] = "EVI"
+            elif _WKO_HOST in head:
+                link_kinds[link] = "WKO"
+            else:
+                link_kinds[link] = "SRC"
 
-    evi_links = dedupe(evi_links)
-    wko_links = dedupe(wko_links)
-    all_links = dedupe(all_links)
-    if "http://" in pred.process_result or "https://" in pred.process_result:
+    if _HTTP_RE.search(pred.process_result):
         return pred
-    selected = (evi_links[:5] + wko_links[:5])[:8] or all_links[:8]
+    evi_links = [link for link, kind in link_kinds.items() if kind == "EVI"]
+    wko_links = [link for link, kind in link_kinds.items() if kind == "WKO"]
+    selected = (evi_links[:5] + wko_links[:5])[:8] or list(link_kinds)[:8]
     if not selected:
         return pred
-    lines = ["", "Evidence links:"]
-    for idx, link in enumerate(selected, start=1):
-        prefix = "EVI" if link in evi_links else ("WKO" if link in wko_links else "SRC")
-        lines.append(f"{idx}. [{prefix}] {link}")
-    pred.process_result = pred.process_result.rstrip() + "\n" + "\n".join(lines)
+    lines = [f"{idx}. [{link_kinds[link]}] {link}" for idx, link in enumerate(selected, start=1)]
+    pred.process_result = "\n".join([pred.process_result.rstrip(), "", "Evidence links:", *lines])
     return pred
 
 
@@ -169,6 +237,7 @@ def run_with_stream(
                 print(chunk.message)
                 if logger:
                     logger.line(chunk.message)
+                    logger.flush()
                 continue
             if isinstance(chunk, dspy.streaming.StreamResponse):
                 field = chunk.signature_field_name
@@ -176,6 +245,7 @@ def run_with_stream(
                     if not in_thought_line:
                         print("[thought] ", end="", flush=True)
                         if logger:
+                            logger.flush_buf()
                             logger.chunk("[thought] ")
                         in_thought_line = True
                         in_result_line = False
@@ -190,6 +260,7 @@ def run_with_stream(
                                 logger.line()
                         print("[draft] ", end="", flush=True)
                         if logger:
+                            logger.flush_buf()
                             logger.chunk("[draft] ")
                         in_result_line = True
                         in_thought_line = False
@@ -202,6 +273,7 @@ def run_with_stream(
     except Exception as exc:
         if logger:
             logger.line(f"[stream:error] {type(exc).__name__}: {exc}")
+            logger.flush()
         raise
     if in_thought_line or in_result_line:
         print()
@@ -214,6 +286,7 @@ def run_with_stream(
     enriched = enrich_final_result_with_links(final_pred)
     if logger:
         logger.line("[request:end]")
+        logger.flush()
     return enriched
 
 
@@ -222,6 +295,7 @@ def run_demo_queries(
     stream_agent: Any,
     history: dspy.History,
     logger: Optional[RunLogger] = None,
+    verbose: bool = True,
 ) -> None:
     print_tool_guide(logger=logger)
     test_queries = [
@@ -243,7 +317,7 @@ def run_demo_queries(
             if logger:
                 logger.line(line)
         pred = run_with_stream(agent=agent, stream_agent=stream_agent, user_request=query, history=history, logger=logger)
-        print_trace(pred, logger=logger)
+        print_trace(pred, logger=logger, verbose=verbose)
         history.messages.append({"user_request": query, "process_result": pred.process_result})
 
 
@@ -252,6 +326,7 @@ def run_interactive(
     stream_agent: Any,
     history: dspy.History,
     logger: Optional[RunLogger] = None,
+    verbose: bool = True,
 ) -> None:
     print_tool_guide(logger=logger)
     line = "\nInteractive mode. Type 'exit' to quit.\n"
@@ -269,5 +344,5 @@ def run_interactive(
         if not user:
             continue
         pred = run_with_stream(agent=agent, stream_agent=stream_agent, user_request=user, history=history, logger=logger)
-        print_trace(pred, logger=logger)
+        print_trace(pred, logger=logger, verbose=verbose)
         history.messages.append({"user_request": user, "process_result": pred.process_result})
@@ -1,14 +1,42 @@
 import ast
 import datetime as dt
+import itertools
 import json
 import math
 import re
+import sys
 from difflib import SequenceMatcher
-from typing import Any, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
+try:
+    from rapidfuzz import fuzz
+except ImportError:  # optional speedup, difflib is the fallback
+    fuzz = None
+
+_UTC = dt.timezone.utc
+_WS_RE = re.compile(r"\s+")
+_URL_RE = re.compile(r"https?://[^\s\"'>]+")
+_LEGAL_FORM_RE = re.compile(r"\b(gmbh|ag|kg|og|mbh|ges\.?m\.?b\.?h\.?)\b")
+_NONALNUM_RE = re.compile(r"[^a-z0-9äöüß\s]")
+_DACH_RE = re.compile(r"austria|österreich|germany|deutschland|switzerland|schweiz")
+
+_KEYWORD_SUBSTITUTIONS = {
+    "waste": ["abfall", "entsorgung"],
+    "recycling": ["recycling", "verwertung"],
+    "environmental services": ["umwelt", "entsorgung", "abfall"],
+    "machinery": ["maschinenbau"],
+}
+_KEYWORD_SUB_RE = re.compile("(?=(" + "|".join(re.escape(k) for k in _KEYWORD_SUBSTITUTIONS) + "))")
 
 
 def clean(text: Optional[str]) -> str:
-    return re.sub(r"\s+", " ", (text or "").strip())
+    return _WS_RE.sub(" ", (text or "").strip())
 
 
 def ilike_pattern(text: str) -> str:
@@ -16,9 +44,58 @@ def ilike_pattern(text: str) -> str:
     return "%" if not cleaned else f"%{cleaned}%"
 
 
+def _dump_head(obj: Any, max_items: int) -> Any:
+    # Every item renders to at least one character, so only the first max_items items in document
+    # order can reach the shown prefix; nested containers are cut too, so {"rows": [...1M...]} stays cheap.
+    budget = max_items
+
+    def prune(value: Any) -> Any:
+        nonlocal budget
+        if isinstance(value, dict):
+            out: Dict[Any, Any] = {}
+            for key, item in value.items():
+                if budget <= 0:
+                    break
+                budget -= 1
+                out[key] = prune(item)
+            return out
+        if isinstance(value, (list, tuple)):
+            items: List[Any] = []
+            for item in value:
+                if budget <= 0:
+                    break
+                budget -= 1
+                items.append(prune(item))
+            return items
+        return value
+
+    return prune(obj)
+
+
 def safe_dump(obj: Any, max_len: int = 900) -> str:
+    obj = _dump_head(obj, max_len)
+    if orjson is not None:
+        try:
+            raw = orjson.dumps(
+                obj,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+                default=str,
+            )
+        except TypeError:
+            raw = None
+        if raw is not None:
+            if len(raw) <= max_len:
+                return raw.decode("utf-8")
+            return raw[:max_len].decode("utf-8", errors="ignore") + "\n... [truncated]"
     try:
-        text = json.dumps(obj, ensure_ascii=False, default=str, indent=2)
+        parts: List[str] = []
+        size = 0
+        for piece in json.JSONEncoder(ensure_ascii=False, default=str, indent=2).iterencode(obj):
+            parts.append(piece)
+            size += len(piece)
+            if size > max_len:
+                break
+        text = "".join(parts)
     except Exception:
         text = str(obj)
     if len(text) <= max_len:
@@ -28,40 +105,27 @@ def safe_dump(obj: Any, max_len: int = 900) -> str:
 
 def extract_links_from_obj(obj: Any) -> List[str]:
     links: List[str] = []
-    pattern = re.compile(r"https?://[^\s\"'>]+")
-
-    def walk(value: Any) -> None:
-        if value is None:
-            return
+    # Iterative pre-order walk; children are pushed reversed so links keep document order.
+    stack: List[Any] = [obj]
+    while stack:
+        value = stack.pop()
         if isinstance(value, str):
-            links.extend(pattern.findall(value))
-            return
-        if isinstance(value, dict):
-            for v in value.values():
-                walk(v)
-            return
-        if isinstance(value, list):
-            for v in value:
-                walk(v)
-            return
-
-    walk(obj)
-    out: List[str] = []
-    seen = set()
-    for link in links:
-        if link in seen:
-            continue
-        seen.add(link)
-        out.append(link.rstrip(".,);"))
-    return out
+            links.extend(_URL_RE.findall(value))
+        elif isinstance(value, dict):
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+    # Interned so the same URL repeated across observations and calls shares one str object.
+    return list(dict.fromkeys(sys.intern(link.rstrip(".,);")) for link in links))
 
 
+@lru_cache(maxsize=8192)
 def norm_name(name: Optional[str]) -> str:
     text = clean(name).lower()
     text = text.replace("&", " und ")
-    text = re.sub(r"\b(gmbh|ag|kg|og|mbh|ges\.?m\.?b\.?h\.?)\b", " ", text)
-    text = re.sub(r"[^a-z0-9äöüß\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _LEGAL_FORM_RE.sub(" ", text)
+    text = _NONALNUM_RE.sub(" ", text)
+    text = _WS_RE.sub(" ", text).strip()
     return text
 
 
@@ -70,56 +134,52 @@ def name_similarity(a: Optional[str], b: Optional[str]) -> float:
     nb = norm_name(b)
     if not na or not nb:
         return 0.0
+    if fuzz is not None:
+        return fuzz.ratio(na, nb) / 100.0
     return SequenceMatcher(None, na, nb).ratio()
 
 
 def country_is_dach(country: Optional[str]) -> bool:
-    c = clean(country).lower()
-    if not c:
-        return False
-    dach_tokens = {
-        "austria",
-        "österreich",
-        "germany",
-        "deutschland",
-        "switzerland",
-        "schweiz",
-    }
-    return any(tok in c for tok in dach_tokens)
+    return bool(_DACH_RE.search(clean(country).lower()))
 
 
 def keyword_variants(text: str) -> List[str]:
+    return list(_keyword_variants(text))
+
+
+@lru_cache(maxsize=1024)
+def _keyword_variants(text: str) -> Tuple[str, ...]:
     base = clean(text).lower()
     if not base:
-        return [""]
+        return ("",)
 
     variants = [base]
-    substitutions = {
-        "waste": ["abfall", "entsorgung"],
-        "recycling": ["recycling", "verwertung"],
-        "environmental services": ["umwelt", "entsorgung", "abfall"],
-        "machinery": ["maschinenbau"],
-    }
-    for src, targets in substitutions.items():
-        if src in base:
+    found = set(_KEYWORD_SUB_RE.findall(base))
+    for src, targets in _KEYWORD_SUBSTITUTIONS.items():
+        if src in found:
             for tgt in targets:
                 variants.append(base.replace(src, tgt))
                 variants.append(tgt)
 
-    seen = set()
-    out: List[str] = []
-    for v in variants:
-        if v in seen:
-            continue
-        seen.add(v)
-        out.append(v)
-    return out
+    return tuple(dict.fromkeys(variants))
 
 
-def _safe_eval_expr(expression: str) -> float:
-    allowed_bin_ops = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod)
-    allowed_unary_ops = (ast.UAdd, ast.USub)
-    allowed_funcs = {
+_CALC_BIN_OPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod)
+_CALC_UNARY_OPS = (ast.UAdd, ast.USub)
+_CALC_NAMES = {"pi": math.pi, "e": math.e}
+
+
+def _float_result(fn: Any) -> Any:
+    def call(*args: float) -> float:
+        return float(fn(*args))
+
+    return call
+
+
+# Functions return floats so evaluation never falls back to unbounded int arithmetic.
+_CALC_FUNCS = {
+    name: _float_result(fn)
+    for name, fn in {
         "sqrt": math.sqrt,
         "sin": math.sin,
         "cos": math.cos,
@@ -128,43 +188,43 @@ def _safe_eval_expr(expression: str) -> float:
         "exp": math.exp,
         "abs": abs,
         "round": round,
-    }
-    allowed_names = {"pi": math.pi, "e": math.e}
-
-    def evaluate(node: ast.AST) -> float:
-        if isinstance(node, ast.Expression):
-            return evaluate(node.body)
-        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
-            return float(node.value)
-        if isinstance(node, ast.BinOp) and isinstance(node.op, allowed_bin_ops):
-            left = evaluate(node.left)
-            right = evaluate(node.right)
-            if isinstance(node.op, ast.Add):
-                return left + right
-            if isinstance(node.op, ast.Sub):
-                return left - right
-            if isinstance(node.op, ast.Mult):
-                return left * right
-            if isinstance(node.op, ast.Div):
-                return left / right
-            if isinstance(node.op, ast.Pow):
-                return left**right
-            return left % right
-        if isinstance(node, ast.UnaryOp) and isinstance(node.op, allowed_unary_ops):
-            value = evaluate(node.operand)
-            return +value if isinstance(node.op, ast.UAdd) else -value
-        if isinstance(node, ast.Name) and node.id in allowed_names:
-            return float(allowed_names[node.id])
-        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-            fn = allowed_funcs.get(node.func.id)
-            if fn is None:
-                raise ValueError(f"Function '{node.func.id}' is not allowed")
-            args = [evaluate(arg) for arg in node.args]
-            return float(fn(*args))
-        raise ValueError("Unsupported expression")
-
-    parsed = ast.parse(expression, mode="eval")
-    return evaluate(parsed)
+    }.items()
+}
+
+
+def _validate_calc_node(node: ast.AST) -> None:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        node.value = float(node.value)
+        return
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _CALC_BIN_OPS):
+        _validate_calc_node(node.left)
+        _validate_calc_node(node.right)
+        return
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, _CALC_UNARY_OPS):
+        _validate_calc_node(node.operand)
+        return
+    if isinstance(node, ast.Name) and node.id in _CALC_NAMES:
+        return
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        if node.func.id not in _CALC_FUNCS:
+            raise ValueError(f"Function '{node.func.id}' is not allowed")
+        if node.keywords:
+            raise ValueError("Unsupported expression")
+        for arg in node.args:
+            _validate_calc_node(arg)
+        return
+    raise ValueError("Unsupported expression")
+
+
+@lru_cache(maxsize=256)
+def _compile_safe(expression: str) -> Any:
+    tree = ast.parse(expression, mode="eval")
+    _validate_calc_node(tree.body)
+    return compile(tree, "<calc>", "eval")
+
+
+def _safe_eval_expr(expression: str) -> float:
+    return float(eval(_compile_safe(expression), {"__builtins__": {}}, {**_CALC_FUNCS, **_CALC_NAMES}))
 
 
 def calculator(expression: str) -> dict[str, Any]:
@@ -185,6 +245,6 @@ def current_datetime(timezone: str = "UTC") -> dict[str, str]:
     if tz == "local":
         now = dt.datetime.now().astimezone()
     else:
-        now = dt.datetime.now(tz=dt.timezone.utc)
+        now = dt.datetime.now(tz=_UTC)
         tz = "utc"
     return {"timezone": tz.upper(), "iso": now.isoformat()}
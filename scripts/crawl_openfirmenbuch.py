@@ -2,24 +2,180 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import datetime as dt
 import hashlib
 import json
 import os
 import random
 import re
+import threading
 import time
-import urllib.error
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+import requests
 from dotenv import find_dotenv, load_dotenv
+from requests.adapters import HTTPAdapter
 from supabase import Client, create_client
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
 
 SCHEMA_SQL_PATH = Path(__file__).resolve().parent / "setup_openfirmenbuch.sql"
 OPENFIRMENBUCH_BASE_URL = "https://api.openfirmenbuch.at"
 OPENFIRMENBUCH_TIMEOUT_SECONDS = int(os.getenv("OPENFIRMENBUCH_TIMEOUT_SECONDS", "30"))
+OPENFIRMENBUCH_POOL_MAXSIZE = 16
+OPENFIRMENBUCH_MAX_CONCURRENCY = int(os.getenv("OPENFIRMENBUCH_MAX_CONCURRENCY", "8"))
+OPENFIRMENBUCH_MAX_INFLIGHT = int(os.getenv("OPENFIRMENBUCH_MAX_INFLIGHT", str(OPENFIRMENBUCH_POOL_MAXSIZE)))
+IDLE_SLEEP_MAX_SECONDS = 60.0
+# Claimed rows are not due again until the lease runs out. Re-seeding resets a running row to pending while
+# it is still being crawled; the lease keeps it from being claimed a second time.
+CLAIM_LEASE_MINUTES = 60
+
+_WS_RE = re.compile(r"\s+")
+_DATE_ISO_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_DATE_COMPACT_RE = re.compile(r"\d{8}")
+_SQL_TOKEN_RE = re.compile(r"--|/\*|'|\"|\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$|;")
+
+SNAPSHOT_CHILD_TABLES = (
+    "ofb_auszug_vollz",
+    "ofb_auszug_euid",
+    "ofb_auszug_fun",
+    "ofb_auszug_per",
+    "ofb_auszug_firma_dkz02",
+    "ofb_auszug_firma_dkz03",
+    "ofb_auszug_firma_dkz06",
+    "ofb_auszug_firma_dkz07",
+)
+
+# OFB camelCase keys -> column names of the financial child tables, in column order.
+_BILANZ_FIELDS = (
+    ("bilanzSumme", "bilanz_summe"),
+    ("bilanzSummeVJ", "bilanz_summe_vj"),
+    ("anlageVermoegen", "anlage_vermoegen"),
+    ("anlageVermoegenVJ", "anlage_vermoegen_vj"),
+    ("immaterielleVermoegensgegenstaende", "immaterielle_vermoegensgegenstaende"),
+    ("aktivierteEigenleistungen", "aktivierte_eigenleistungen"),
+    ("sachanlagen", "sachanlagen"),
+    ("finanzanlagen", "finanzanlagen"),
+    ("umlaufvermoegen", "umlaufvermoegen"),
+    ("vorraete", "vorraete"),
+    ("vorraeteVJ", "vorraete_vj"),
+    ("forderungen", "forderungen"),
+    ("forderungenVJ", "forderungen_vj"),
+    ("forderungenLieferungen", "forderungen_lieferungen"),
+    ("wertpapiere", "wertpapiere"),
+    ("liquidesVermoegen", "liquides_vermoegen"),
+    ("liquidesVermoegenVJ", "liquides_vermoegen_vj"),
+    ("rechnungsabgrenzungen", "rechnungsabgrenzungen"),
+    ("eigenkapital", "eigenkapital"),
+    ("eigenkapitalVJ", "eigenkapital_vj"),
+    ("eingefordertesStammkapital", "eingefordertes_stammkapital"),
+    ("kapitalruecklagen", "kapitalruecklagen"),
+    ("gewinnruecklagen", "gewinnruecklagen"),
+    ("gewinnruecklagenVJ", "gewinnruecklagen_vj"),
+    ("bilanzgewinn", "bilanzgewinn"),
+    ("vortrag", "vortrag"),
+    ("vortragVJ", "vortrag_vj"),
+    ("rueckstellungen", "rueckstellungen"),
+    ("rueckstellungenVJ", "rueckstellungen_vj"),
+    ("verbindlichkeiten", "verbindlichkeiten"),
+    ("verbindlichkeitenVJ", "verbindlichkeiten_vj"),
+    ("langfristigeVerbindlichkeiten", "langfristige_verbindlichkeiten"),
+    ("kurzfristigeVerbindlichkeiten", "kurzfristige_verbindlichkeiten"),
+    ("verbindlichkeitenLieferungen", "verbindlichkeiten_lieferungen"),
+    ("langfristigeForderungen", "langfristige_forderungen"),
+    ("kurzfristigeForderungen", "kurzfristige_forderungen"),
+    ("passiveRechnungsabgrenzungen", "passive_rechnungsabgrenzungen"),
+)
+
+_GUV_FIELDS = (
+    ("betriebsErfolg", "betriebs_erfolg"),
+    ("betriebsErfolgVJ", "betriebs_erfolg_vj"),
+    ("umsatzerloese", "umsatzerloese"),
+    ("umsatzerloeseVJ", "umsatzerloese_vj"),
+    ("warenUndMaterialeinkauf", "waren_und_materialeinkauf"),
+    ("warenUndMaterialeinkaufVJ", "waren_und_materialeinkauf_vj"),
+    ("jahresueberschuss", "jahresueberschuss"),
+    ("jahresueberschussVJ", "jahresueberschuss_vj"),
+    ("bestandsveraenderung", "bestandsveraenderung"),
+    ("bestandsveraenderungVJ", "bestandsveraenderung_vj"),
+    ("personalaufwand", "personalaufwand"),
+    ("personalaufwandVJ", "personalaufwand_vj"),
+    ("steueraufwand", "steueraufwand"),
+    ("ergebnisVorSteuern", "ergebnis_vor_steuern"),
+    ("zinsenUndAehnlicheAufwendungen", "zinsen_und_aehnliche_aufwendungen"),
+    ("abschreibungen", "abschreibungen"),
+    ("sonstigeBetrieblicheErtraege", "sonstige_betriebliche_ertraege"),
+    ("sozialeAufwendungen", "soziale_aufwendungen"),
+    ("sonstigeBetrieblicheAufwendungen", "sonstige_betriebliche_aufwendungen"),
+    ("ertraegeAusBeteiligungen", "ertraege_aus_beteiligungen"),
+    ("ertraegeAusWertpapieren", "ertraege_aus_wertpapieren"),
+    ("sonstigeZinsenUndAehnlicheErtraege", "sonstige_zinsen_und_aehnliche_ertraege"),
+    ("aufwendungenAusFinanzanlagen", "aufwendungen_aus_finanzanlagen"),
+    ("finanzerfolg", "finanzerfolg"),
+    ("aufloesungGewinnruecklagen", "aufloesung_gewinnruecklagen"),
+)
+
+_BILANZ_KENNZAHLEN_FIELDS = (
+    ("eigenkapitalquote", "eigenkapitalquote"),
+    ("fremdkapitalquote", "fremdkapitalquote"),
+    ("anlagendeckungsgrad", "anlagendeckungsgrad"),
+    ("anlagendeckungsgrad2", "anlagendeckungsgrad2"),
+    ("liquiditaetGrad1", "liquiditaet_grad1"),
+    ("liquiditaetGrad2", "liquiditaet_grad2"),
+    ("liquiditaetGrad3", "liquiditaet_grad3"),
+    ("workingCapital", "working_capital"),
+    ("anlagenintensitaet", "anlagenintensitaet"),
+    ("umlaufintensitaet", "umlaufintensitaet"),
+    ("verschuldungsgrad", "verschuldungsgrad"),
+    ("investiertesKapital", "investiertes_kapital"),
+    ("veraenderungLiquiderMittel", "veraenderung_liquider_mittel"),
+    ("returnOnEquity", "return_on_equity"),
+    ("returnOnEquitySimplified", "return_on_equity_simplified"),
+    ("returnOnAssets", "return_on_assets"),
+    ("returnOnAssetsSimplified", "return_on_assets_simplified"),
+)
+
+_GUV_KENNZAHLEN_FIELDS = (
+    ("ebitMarge", "ebit_marge"),
+    ("nettomarge", "nettomarge"),
+    ("materialquote", "materialquote"),
+    ("personalquote", "personalquote"),
+    ("umsatzwachstumKurz", "umsatzwachstum_kurz"),
+    ("effektiverSteuersatz", "effektiver_steuersatz"),
+    ("investitionsquote", "investitionsquote"),
+    ("debitorenUmschlagshaeufigkeit", "debitoren_umschlagshaeufigkeit"),
+    ("kreditorenUmschlagshaeufigkeit", "kreditoren_umschlagshaeufigkeit"),
+    ("bruttomarge", "bruttomarge"),
+    ("ausschuettungen", "ausschuettungen"),
+    ("returnOnInvestedCapital", "return_on_invested_capital"),
+    ("operativerCashflow", "operativer_cashflow"),
+    ("cashflowQuote", "cashflow_quote"),
+    ("lagerumschlagsdauer", "lagerumschlagsdauer"),
+    ("forderungsumschlagsdauer", "forderungsumschlagsdauer"),
+    ("verbindlichkeitsdauer", "verbindlichkeitsdauer"),
+    ("cashConversionCycle", "cash_conversion_cycle"),
+    ("FCF", "fcf"),
+    ("CAPEX", "capex"),
+)
+
+_BILANZ_KEYS = frozenset(key for key, _ in _BILANZ_FIELDS)
+_GUV_KEYS = frozenset(key for key, _ in _GUV_FIELDS)
+_BILANZ_KENNZAHLEN_KEYS = frozenset(key for key, _ in _BILANZ_KENNZAHLEN_FIELDS)
+_GUV_KENNZAHLEN_KEYS = frozenset(key for key, _ in _GUV_KENNZAHLEN_FIELDS)
+
+# One keep-alive session for every OFB call; created lazily so importing the script stays cheap.
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+# Caps in-flight OFB requests across all worker threads, independent of how many items run at once.
+_OFB_INFLIGHT = threading.BoundedSemaphore(max(1, OPENFIRMENBUCH_MAX_INFLIGHT))
 
 
 def now_utc_iso() -> str:
@@ -38,25 +194,31 @@ def as_text(value: Any) -> Optional[str]:
 
 
 def clean_name(value: Any) -> str:
-    text = as_text(value) or ""
-    text = text.lower()
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    return _clean_name_text(as_text(value) or "")
+
+
+@lru_cache(maxsize=8192)
+def _clean_name_text(text: str) -> str:
+    # Company names repeat across WKO, EVI and projectfacts; cache on the stripped text.
+    return _WS_RE.sub(" ", text.lower()).strip()
 
 
 def normalize_fnr(value: Any) -> str:
-    text = as_text(value) or ""
-    text = text.replace(" ", "")
-    return text.lower()
+    return _normalize_fnr_text(as_text(value) or "")
+
+
+@lru_cache(maxsize=8192)
+def _normalize_fnr_text(text: str) -> str:
+    return text.replace(" ", "").lower()
 
 
 def to_date_iso(value: Any) -> Optional[str]:
     txt = as_text(value)
     if not txt:
         return None
-    if re.fullmatch(r"\d{4}-\d{2}-\d{2}", txt):
+    if _DATE_ISO_RE.fullmatch(txt):
         return txt
-    if re.fullmatch(r"\d{8}", txt):
+    if _DATE_COMPACT_RE.fullmatch(txt):
         return f"{txt[:4]}-{txt[4:6]}-{txt[6:8]}"
     try:
         parsed = dt.datetime.fromisoformat(txt.replace("Z", "+00:00"))
@@ -77,12 +239,41 @@ def to_timestamptz_iso(value: Any) -> Optional[str]:
 
 
 def split_sql_statements(sql_text: str) -> List[str]:
+    # One pass that jumps between tokens: ';' only ends a statement outside quotes,
+    # dollar-quoted bodies and comments. Comments are dropped, the statements they precede are kept.
     statements: List[str] = []
-    for part in sql_text.split(";"):
-        stmt = part.strip()
-        if not stmt or stmt.startswith("--"):
-            continue
-        statements.append(f"{stmt};")
+    parts: List[str] = []
+    end_of_text = len(sql_text)
+    pos = start = 0
+
+    def flush() -> None:
+        stmt = "".join(parts).strip()
+        parts.clear()
+        if stmt:
+            statements.append(f"{stmt};")
+
+    while True:
+        match = _SQL_TOKEN_RE.search(sql_text, pos)
+        if match is None:
+            break
+        token = match.group(0)
+        if token == ";":
+            parts.append(sql_text[start:match.start()])
+            flush()
+            pos = start = match.end()
+        elif token == "--" or token == "/*":
+            parts.append(sql_text[start:match.start()])
+            closing = "\n" if token == "--" else "*/"
+            # Leave a separator where the comment was, or the tokens around it run together.
+            parts.append("\n" if token == "--" else " ")
+            end = sql_text.find(closing, match.end())
+            pos = start = end_of_text if end == -1 else end + len(closing)
+        else:
+            # Quote or $tag$: skip to the matching delimiter; doubled '' simply reopens the literal.
+            end = sql_text.find(token, match.end())
+            pos = end_of_text if end == -1 else end + len(token)
+    parts.append(sql_text[start:])
+    flush()
     return statements
 
 
@@ -119,8 +310,14 @@ def ensure_openfirmenbuch_tables_ready(client: Client) -> None:
         ("ofb_financial_years", "id,firmennummer,gj_beginn,gj_ende"),
     ]
     try:
-        for table, columns in required_checks:
-            client.table(table).select(columns, count="exact").limit(1).execute()
+        # Independent probes: fire them together and surface the first failure.
+        with ThreadPoolExecutor(max_workers=len(required_checks)) as pool:
+            probes = [
+                pool.submit(client.table(table).select(columns, count="exact").limit(1).execute)
+                for table, columns in required_checks
+            ]
+            for probe in as_completed(probes):
+                probe.result()
     except Exception as exc:
         msg = str(exc)
         if "PGRST205" in msg or "Could not find the table 'public.ofb_crawl_queue'" in msg:
@@ -145,34 +342,92 @@ def create_client_from_env() -> Client:
     return create_client(url, service_role_key)
 
 
+def get_ofb_session() -> requests.Session:
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            # OFB lookups are read-only queries sent as POST, so retrying them is safe.
+            retry = Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({"POST"}),
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OPENFIRMENBUCH_POOL_MAXSIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+            _SESSION = session
+        return _SESSION
+
+
 def ofb_post_json(path: str, payload: Dict[str, Any]) -> Any:
     url = f"{OPENFIRMENBUCH_BASE_URL}{path}"
-    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    req = urllib.request.Request(
-        url=url,
-        data=body,
-        headers={"Content-Type": "application/json", "Accept": "application/json"},
-        method="POST",
-    )
-    with urllib.request.urlopen(req, timeout=OPENFIRMENBUCH_TIMEOUT_SECONDS) as response:
-        raw = response.read().decode("utf-8")
-    return json.loads(raw)
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    with _OFB_INFLIGHT:
+        response = get_ofb_session().post(url, data=body, timeout=OPENFIRMENBUCH_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    # Parsed in one go on purpose: snapshots keep the whole body as raw_response, so streaming
+    # PER/FUN items would not lower the peak; the raw bytes die with `response` on return.
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return json.loads(response.content)
+
+
+def _unexpected_ofb_payload(path: str, payload: Any, expected: str) -> RuntimeError:
+    snippet = repr(payload)[:200]
+    return RuntimeError(f"Unexpected {path} response: expected {expected}, got {type(payload).__name__}: {snippet}")
+
+
+def ofb_post_json_dict(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    data = ofb_post_json(path, payload)
+    if not isinstance(data, dict):
+        raise _unexpected_ofb_payload(path, data, "object")
+    return data
+
 
+def ofb_post_json_list(path: str, payload: Dict[str, Any]) -> List[Any]:
+    data = ofb_post_json(path, payload)
+    if data is None:
+        return []
+    if not isinstance(data, list):
+        # E.g. an error object for a company without filings: keep the crawl going without rows.
+        print(f"Warning: {_unexpected_ofb_payload(path, data, 'array')}; treating as empty")
+        return []
+    return data
 
-def fetch_rows_paginated(client: Client, table: str, columns: str, limit: int, max_rows: int) -> List[Dict[str, Any]]:
+
+def fetch_rows_paginated(
+    client: Client,
+    table: str,
+    columns: str,
+    key_column: str,
+    limit: int,
+    max_rows: int,
+) -> List[Dict[str, Any]]:
+    # Keyset pagination on a unique, non-null key: every page is an index range scan, no OFFSET skipping.
     out: List[Dict[str, Any]] = []
-    offset = 0
+    last_key: Optional[str] = None
     while len(out) < max_rows:
-        end = offset + limit - 1
-        resp = client.table(table).select(columns).range(offset, end).execute()
+        page_size = min(limit, max_rows - len(out))
+        query = client.table(table).select(columns).order(key_column)
+        if last_key is not None:
+            query = query.gt(key_column, last_key)
+        resp = query.limit(page_size).execute()
         rows = getattr(resp, "data", None) or []
         if not rows:
             break
         out.extend(rows)
-        if len(rows) < limit:
+        if len(rows) < page_size:
+            break
+        last_key = rows[-1].get(key_column)
+        # NULL keys sort last and cannot be paged past; without this the next query restarts from the top.
+        if last_key is None:
             break
-        offset += limit
-    return out[:max_rows]
+    return out
 
 
 def queue_seed_rows(client: Client, rows: Iterable[Dict[str, Any]]) -> int:
@@ -183,38 +438,71 @@ def queue_seed_rows(client: Client, rows: Iterable[Dict[str, Any]]) -> int:
     return len(payload)
 
 
+def fallback_source_key(text: str) -> str:
+    # Stable dedup key for source rows without their own id. It is the queue's conflict key, so the
+    # digest must not change: a different one would re-key every keyless row already queued.
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def named_seed_payload(rows: List[Dict[str, Any]], source_system: str, key_column: str, priority: int) -> List[Dict[str, Any]]:
+    payload: List[Dict[str, Any]] = []
+    for row in rows:
+        name = as_text(row.get("name"))
+        if not name:
+            continue
+        name_norm = clean_name(name)
+        payload.append(
+            {
+                "source_system": source_system,
+                "source_key": as_text(row.get(key_column)) or fallback_source_key(name_norm),
+                "source_name": name,
+                "search_name": name,
+                "search_name_norm": name_norm,
+                "priority": priority,
+                "status": "pending",
+            }
+        )
+    return payload
+
+
 def seed_queue_from_sources(client: Client, max_rows_per_source: int = 5000) -> Dict[str, int]:
     result = {"wko": 0, "evi": 0, "projectfacts": 0}
 
-    wko_rows = fetch_rows_paginated(
-        client,
-        "wko_companies",
-        "wko_key,name",
-        limit=1000,
-        max_rows=max_rows_per_source,
-    )
-    wko_payload = [
-        {
-            "source_system": "wko",
-            "source_key": as_text(row.get("wko_key")) or hashlib.sha1(clean_name(row.get("name")).encode("utf-8")).hexdigest(),
-            "source_name": as_text(row.get("name")),
-            "search_name": as_text(row.get("name")),
-            "search_name_norm": clean_name(row.get("name")),
-            "priority": 200,
-            "status": "pending",
-        }
-        for row in wko_rows
-        if as_text(row.get("name"))
-    ]
-    result["wko"] = queue_seed_rows(client, wko_payload)
-
-    evi_rows = fetch_rows_paginated(
-        client,
-        "evi_bilanz_publications",
-        "evi_key,company_name,firmenbuchnummer",
-        limit=1000,
-        max_rows=max_rows_per_source,
-    )
+    # The three source reads are independent; overlap their round trips.
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        wko_future = pool.submit(
+            fetch_rows_paginated,
+            client,
+            "wko_companies",
+            "wko_key,name",
+            key_column="wko_key",
+            limit=1000,
+            max_rows=max_rows_per_source,
+        )
+        evi_future = pool.submit(
+            fetch_rows_paginated,
+            client,
+            "evi_bilanz_publications",
+            "evi_key,company_name,firmenbuchnummer",
+            key_column="evi_key",
+            limit=1000,
+            max_rows=max_rows_per_source,
+        )
+        pf_future = pool.submit(
+            fetch_rows_paginated,
+            client,
+            "projectfacts",
+            "pf_key,name",
+            key_column="pf_key",
+            limit=1000,
+            max_rows=max_rows_per_source,
+        )
+        wko_rows = wko_future.result()
+        evi_rows = evi_future.result()
+        pf_rows = pf_future.result()
+
+    result["wko"] = queue_seed_rows(client, named_seed_payload(wko_rows, "wko", "wko_key", priority=200))
+
     evi_payload = []
     for row in evi_rows:
         source_key = as_text(row.get("evi_key"))
@@ -223,7 +511,7 @@ def seed_queue_from_sources(client: Client, max_rows_per_source: int = 5000) ->
         if not source_name and not fnr:
             continue
         if not source_key:
-            source_key = hashlib.sha1(f"{source_name or ''}|{fnr}".encode("utf-8")).hexdigest()
+            source_key = fallback_source_key(f"{source_name or ''}|{fnr}")
         evi_payload.append(
             {
                 "source_system": "evi",
@@ -238,46 +526,28 @@ def seed_queue_from_sources(client: Client, max_rows_per_source: int = 5000) ->
         )
     result["evi"] = queue_seed_rows(client, evi_payload)
 
-    pf_rows = fetch_rows_paginated(
-        client,
-        "projectfacts",
-        "pf_key,name",
-        limit=1000,
-        max_rows=max_rows_per_source,
-    )
-    pf_payload = [
-        {
-            "source_system": "projectfacts",
-            "source_key": as_text(row.get("pf_key")) or hashlib.sha1(clean_name(row.get("name")).encode("utf-8")).hexdigest(),
-            "source_name": as_text(row.get("name")),
-            "search_name": as_text(row.get("name")),
-            "search_name_norm": clean_name(row.get("name")),
-            "priority": 150,
-            "status": "pending",
-        }
-        for row in pf_rows
-        if as_text(row.get("name"))
-    ]
-    result["projectfacts"] = queue_seed_rows(client, pf_payload)
+    result["projectfacts"] = queue_seed_rows(client, named_seed_payload(pf_rows, "projectfacts", "pf_key", priority=150))
     return result
 
 
 def pick_best_search_result(results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Rows come from insert_search_log, so the API fields are already snake_case.
     def score(row: Dict[str, Any]) -> Tuple[int, int]:
-        status = as_text(row.get("finalStatus")) or ""
+        status = (as_text(row.get("final_status")) or "").lower()
         active_score = 2
-        if "gel" in status.lower():
+        if "gel" in status:
             active_score = 0
-        elif "histor" in status.lower():
+        elif "histor" in status:
             active_score = 1
-        has_seat = 1 if as_text(row.get("finalSeat")) else 0
+        has_seat = 1 if as_text(row.get("final_seat")) else 0
         return (active_score, has_seat)
 
-    ranked = sorted(results, key=score, reverse=True)
-    return ranked[0] if ranked else None
+    # max keeps the first of equally ranked rows, same as the stable sort it replaces.
+    return max(results, key=score, default=None)
 
 
 def insert_search_log(client: Client, request_payload: Dict[str, Any], response_payload: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+    ergebnis = response_payload.get("ERGEBNIS") or []
     run_payload = {
         "request_firmenwortlaut": request_payload.get("FIRMENWORTLAUT"),
         "request_exaktesuche": request_payload.get("EXAKTESUCHE", False),
@@ -286,7 +556,7 @@ def insert_search_log(client: Client, request_payload: Dict[str, Any], response_
         "request_rechtsform": request_payload.get("RECHTSFORM"),
         "request_rechtseigenschaft": request_payload.get("RECHTSEIGENSCHAFT"),
         "request_ortnr": request_payload.get("ORTNR"),
-        "response_count": len(response_payload.get("ERGEBNIS") or []),
+        "response_count": len(ergebnis),
         "raw_response": response_payload,
         "ran_at": now_utc_iso(),
     }
@@ -296,28 +566,23 @@ def insert_search_log(client: Client, request_payload: Dict[str, Any], response_
         raise RuntimeError("Failed to create ofb_search_runs row")
     run_id = str(run_rows[0]["id"])
 
-    mapped_results: List[Dict[str, Any]] = []
-    for result in response_payload.get("ERGEBNIS") or []:
-        if not isinstance(result, dict):
-            continue
-        fnr = normalize_fnr(result.get("fnr"))
-        if not fnr:
-            continue
-        mapped_results.append(
-            {
-                "search_run_id": run_id,
-                "firmennummer": fnr,
-                "court_text": result.get("courtText"),
-                "court_code": result.get("courtCode"),
-                "final_status": result.get("finalStatus"),
-                "final_names": result.get("finalNames"),
-                "final_seat": result.get("finalSeat"),
-                "final_legal_form_text": result.get("finalLegalFormText"),
-                "final_legal_form_code": result.get("finalLegalFormCode"),
-                "final_right_property": result.get("finalRightProperty"),
-                "raw_result": result,
-            }
-        )
+    mapped_results: List[Dict[str, Any]] = [
+        {
+            "search_run_id": run_id,
+            "firmennummer": fnr,
+            "court_text": result.get("courtText"),
+            "court_code": result.get("courtCode"),
+            "final_status": result.get("finalStatus"),
+            "final_names": result.get("finalNames"),
+            "final_seat": result.get("finalSeat"),
+            "final_legal_form_text": result.get("finalLegalFormText"),
+            "final_legal_form_code": result.get("finalLegalFormCode"),
+            "final_right_property": result.get("finalRightProperty"),
+            "raw_result": result,
+        }
+        for result in ergebnis
+        if isinstance(result, dict) and (fnr := normalize_fnr(result.get("fnr")))
+    ]
     if mapped_results:
         res_resp = client.table("ofb_search_results").upsert(
             mapped_results,
@@ -353,11 +618,16 @@ def insert_search_log(client: Client, request_payload: Dict[str, Any], response_
     return run_id, mapped_results
 
 
-def upsert_company_from_search(client: Client, result: Dict[str, Any], euid: Optional[str] = None) -> None:
+def company_payload_from_search(
+    result: Dict[str, Any],
+    euid: Optional[str] = None,
+    seen_at: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
     fnr = normalize_fnr(result.get("firmennummer"))
     if not fnr:
-        return
-    payload = {
+        return None
+    seen_at = seen_at or now_utc_iso()
+    return {
         "firmennummer": fnr,
         "court_code": result.get("court_code"),
         "court_text": result.get("court_text"),
@@ -368,10 +638,9 @@ def upsert_company_from_search(client: Client, result: Dict[str, Any], euid: Opt
         "final_legal_form_code": result.get("final_legal_form_code"),
         "final_right_property": result.get("final_right_property"),
         "euid": euid,
-        "last_seen_at": now_utc_iso(),
-        "updated_at": now_utc_iso(),
+        "last_seen_at": seen_at,
+        "updated_at": seen_at,
     }
-    client.table("ofb_companies").upsert(payload, on_conflict="firmennummer").execute()
 
 
 def get_or_create_snapshot(
@@ -381,16 +650,6 @@ def get_or_create_snapshot(
     umfang: str,
     response: Dict[str, Any],
 ) -> str:
-    existing_resp = (
-        client.table("ofb_auszug_snapshots")
-        .select("id")
-        .eq("firmennummer", firmennummer)
-        .eq("stichtag", stichtag)
-        .eq("umfang", umfang)
-        .limit(1)
-        .execute()
-    )
-    existing = getattr(existing_resp, "data", None) or []
     payload = {
         "firmennummer": firmennummer,
         "stichtag": stichtag,
@@ -401,37 +660,46 @@ def get_or_create_snapshot(
         "kur": response.get("KUR"),
         "ident": response.get("IDENT"),
         "zwl": response.get("ZWL"),
+        # Passed as a dict on purpose: a pre-encoded string would land in the jsonb column as a JSON string scalar.
         "raw_response": response,
     }
-    if existing:
-        snapshot_id = existing[0]["id"]
-        client.table("ofb_auszug_snapshots").update(payload).eq("id", snapshot_id).execute()
-        return str(snapshot_id)
-    inserted = client.table("ofb_auszug_snapshots").insert(payload).execute()
-    rows = getattr(inserted, "data", None) or []
+    # Relies on the ofb_auszug_snapshots_unique_key_uq index: one round trip for insert-or-update.
+    upserted = client.table("ofb_auszug_snapshots").upsert(payload, on_conflict="firmennummer,stichtag,umfang").execute()
+    rows = getattr(upserted, "data", None) or []
     if not rows:
-        raise RuntimeError("Failed to insert ofb_auszug_snapshots")
+        raise RuntimeError("Failed to upsert ofb_auszug_snapshots")
     return str(rows[0]["id"])
 
 
+def delete_snapshot_children(client: Client, snapshot_id: str) -> None:
+    try:
+        client.rpc("ofb_delete_snapshot_children", {"sid": snapshot_id}).execute()
+        return
+    except Exception as exc:
+        if not is_missing_rpc_function_error(exc):
+            raise
+    # Schema predates the rpc: fall back to one delete per table.
+    for table in SNAPSHOT_CHILD_TABLES:
+        client.table(table).delete().eq("snapshot_id", snapshot_id).execute()
+
+
 def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[str, Any]) -> Optional[str]:
     # Rebuild children on each refresh to keep schema mapping simple and deterministic.
-    child_tables = [
-        "ofb_auszug_vollz",
-        "ofb_auszug_euid",
-        "ofb_auszug_fun",
-        "ofb_auszug_per",
-        "ofb_auszug_firma_dkz02",
-        "ofb_auszug_firma_dkz03",
-        "ofb_auszug_firma_dkz06",
-        "ofb_auszug_firma_dkz07",
-    ]
-    for table in child_tables:
-        client.table(table).delete().eq("snapshot_id", snapshot_id).execute()
+    delete_snapshot_children(client, snapshot_id)
+
+    # Rows stay plain dicts: every child stores its source dict as raw_row, so decoding
+    # into typed structs would only add a conversion back before the insert.
+    euid_in = response.get("EUID") or []
+    vollz_in = response.get("VOLLZ") or []
+    per_in = response.get("PER") or []
+    fun_in = response.get("FUN") or []
+    firma = response.get("FIRMA")
+    if not isinstance(firma, dict):
+        firma = {}
 
     euid_value: Optional[str] = None
     euid_rows = []
-    for row in response.get("EUID") or []:
+    for row in euid_in:
         if not isinstance(row, dict):
             continue
         euid_rows.append(
@@ -448,7 +716,7 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
         client.table("ofb_auszug_euid").insert(euid_rows).execute()
 
     vollz_rows = []
-    for row in response.get("VOLLZ") or []:
+    for row in vollz_in:
         if not isinstance(row, dict):
             continue
         hg = row.get("HG") if isinstance(row.get("HG"), dict) else {}
@@ -468,9 +736,9 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
     if vollz_rows:
         client.table("ofb_auszug_vollz").insert(vollz_rows).execute()
 
-    per_id_by_pnr: Dict[str, str] = {}
     per_rows = []
-    for person in response.get("PER") or []:
+    per_dkz02_lists: List[Tuple[str, List[Any]]] = []
+    for person in per_in:
         if not isinstance(person, dict):
             continue
         pnr = as_text(person.get("PNR"))
@@ -488,22 +756,19 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
                 "raw_row": person,
             }
         )
+        per_dkz02_lists.append((pnr, person.get("PE_DKZ02") or []))
     inserted_per: List[Dict[str, Any]] = []
     if per_rows:
         per_resp = client.table("ofb_auszug_per").insert(per_rows).execute()
         inserted_per = getattr(per_resp, "data", None) or []
-    for row in inserted_per:
-        per_id_by_pnr[str(row.get("pnr"))] = str(row.get("id"))
+    per_id_by_pnr = {str(row.get("pnr")): str(row.get("id")) for row in inserted_per}
 
     per_dkz02_rows = []
-    for person in response.get("PER") or []:
-        if not isinstance(person, dict):
-            continue
-        pnr = as_text(person.get("PNR"))
-        per_id = per_id_by_pnr.get(pnr or "")
+    for pnr, pe_dkz02_list in per_dkz02_lists:
+        per_id = per_id_by_pnr.get(pnr)
         if not per_id:
             continue
-        for idx, pe_dkz02 in enumerate(person.get("PE_DKZ02") or []):
+        for idx, pe_dkz02 in enumerate(pe_dkz02_list):
             if not isinstance(pe_dkz02, dict):
                 continue
             per_dkz02_rows.append(
@@ -528,7 +793,8 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
         client.table("ofb_auszug_per_dkz02").upsert(per_dkz02_rows, on_conflict="per_id,seq_no").execute()
 
     fun_rows = []
-    for fun in response.get("FUN") or []:
+    fun_dkz10_lists: List[List[Any]] = []
+    for fun in fun_in:
         if not isinstance(fun, dict):
             continue
         fun_rows.append(
@@ -543,21 +809,19 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
                 "raw_row": fun,
             }
         )
+        fun_dkz10_lists.append(fun.get("FU_DKZ10") or [])
     inserted_fun: List[Dict[str, Any]] = []
     if fun_rows:
         fun_resp = client.table("ofb_auszug_fun").insert(fun_rows).execute()
         inserted_fun = getattr(fun_resp, "data", None) or []
 
+    # Inserted rows come back in payload order, so they line up with fun_dkz10_lists.
     fun_dkz10_rows = []
-    for idx_fun, fun in enumerate(response.get("FUN") or []):
-        if not isinstance(fun, dict):
-            continue
-        if idx_fun >= len(inserted_fun):
-            continue
-        fun_id = inserted_fun[idx_fun].get("id")
+    for inserted, dkz10_list in zip(inserted_fun, fun_dkz10_lists):
+        fun_id = inserted.get("id")
         if not fun_id:
             continue
-        for seq_no, dkz10 in enumerate(fun.get("FU_DKZ10") or []):
+        for seq_no, dkz10 in enumerate(dkz10_list):
             if not isinstance(dkz10, dict):
                 continue
             vart = dkz10.get("VART") if isinstance(dkz10.get("VART"), dict) else {}
@@ -586,12 +850,11 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
     if fun_dkz10_rows:
         client.table("ofb_auszug_fun_dkz10").upsert(fun_dkz10_rows, on_conflict="fun_id,seq_no").execute()
 
-    firma = response.get("FIRMA") if isinstance(response.get("FIRMA"), dict) else {}
-
+    dkz02_rows = []
     for seq_no, row in enumerate(firma.get("FI_DKZ02") or []):
         if not isinstance(row, dict):
             continue
-        client.table("ofb_auszug_firma_dkz02").insert(
+        dkz02_rows.append(
             {
                 "snapshot_id": snapshot_id,
                 "seq_no": seq_no,
@@ -603,12 +866,15 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
                 "vnr": row.get("VNR"),
                 "raw_row": row,
             }
-        ).execute()
+        )
+    if dkz02_rows:
+        client.table("ofb_auszug_firma_dkz02").insert(dkz02_rows).execute()
 
+    dkz03_rows = []
     for seq_no, row in enumerate(firma.get("FI_DKZ03") or []):
         if not isinstance(row, dict):
             continue
-        client.table("ofb_auszug_firma_dkz03").insert(
+        dkz03_rows.append(
             {
                 "snapshot_id": snapshot_id,
                 "seq_no": seq_no,
@@ -628,13 +894,16 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
                 "vnr": row.get("VNR"),
                 "raw_row": row,
             }
-        ).execute()
+        )
+    if dkz03_rows:
+        client.table("ofb_auszug_firma_dkz03").insert(dkz03_rows).execute()
 
+    dkz06_rows = []
     for seq_no, row in enumerate(firma.get("FI_DKZ06") or []):
         if not isinstance(row, dict):
             continue
         ortnr = row.get("ORTNR") if isinstance(row.get("ORTNR"), dict) else {}
-        client.table("ofb_auszug_firma_dkz06").insert(
+        dkz06_rows.append(
             {
                 "snapshot_id": snapshot_id,
                 "seq_no": seq_no,
@@ -647,13 +916,16 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
                 "vnr": row.get("VNR"),
                 "raw_row": row,
             }
-        ).execute()
+        )
+    if dkz06_rows:
+        client.table("ofb_auszug_firma_dkz06").insert(dkz06_rows).execute()
 
+    dkz07_rows = []
     for seq_no, row in enumerate(firma.get("FI_DKZ07") or []):
         if not isinstance(row, dict):
             continue
         rechtsform = row.get("RECHTSFORM") if isinstance(row.get("RECHTSFORM"), dict) else {}
-        client.table("ofb_auszug_firma_dkz07").insert(
+        dkz07_rows.append(
             {
                 "snapshot_id": snapshot_id,
                 "seq_no": seq_no,
@@ -665,31 +937,53 @@ def replace_snapshot_children(client: Client, snapshot_id: str, response: Dict[s
                 "rechtsform_text": rechtsform.get("TEXT"),
                 "raw_row": row,
             }
-        ).execute()
+        )
+    if dkz07_rows:
+        client.table("ofb_auszug_firma_dkz07").insert(dkz07_rows).execute()
 
     return euid_value
 
 
 def upsert_financial_blocks(client: Client, firmennummer: str, rows: List[Dict[str, Any]]) -> int:
-    total = 0
+    # Pass 1: one upsert for every fiscal year. Later duplicates of a period win, as they did row by row.
+    rows_by_period: Dict[Tuple[str, str], Dict[str, Any]] = {}
     for row in rows:
         gj_beginn = to_timestamptz_iso(row.get("gjBeginn"))
         gj_ende = to_timestamptz_iso(row.get("gjEnde"))
         if not gj_beginn or not gj_ende:
             continue
-        year_resp = client.table("ofb_financial_years").upsert(
+        rows_by_period[(gj_beginn, gj_ende)] = row
+    if not rows_by_period:
+        return 0
+    year_resp = client.table("ofb_financial_years").upsert(
+        [
             {
                 "firmennummer": firmennummer,
                 "gj_beginn": gj_beginn,
                 "gj_ende": gj_ende,
                 "raw_row": row,
-            },
-            on_conflict="firmennummer,gj_beginn,gj_ende",
-        ).execute()
-        year_rows = getattr(year_resp, "data", None) or []
-        if not year_rows:
+            }
+            for (gj_beginn, gj_ende), row in rows_by_period.items()
+        ],
+        on_conflict="firmennummer,gj_beginn,gj_ende",
+    ).execute()
+    year_id_by_period: Dict[Tuple[Optional[str], Optional[str]], Any] = {}
+    for year_row in getattr(year_resp, "data", None) or []:
+        # Normalize the returned timestamps the same way as the request keys.
+        period = (to_timestamptz_iso(year_row.get("gj_beginn")), to_timestamptz_iso(year_row.get("gj_ende")))
+        year_id_by_period[period] = year_row["id"]
+
+    # Pass 2: one batched upsert per child table.
+    bilanz_rows: List[Dict[str, Any]] = []
+    guv_rows: List[Dict[str, Any]] = []
+    kennzahlen_bilanz_rows: List[Dict[str, Any]] = []
+    kennzahlen_guv_rows: List[Dict[str, Any]] = []
+    years_mapped = 0
+    for period, row in rows_by_period.items():
+        financial_year_id = year_id_by_period.get(period)
+        if not financial_year_id:
             continue
-        financial_year_id = year_rows[0]["id"]
+        years_mapped += 1
 
         bilanz = row.get("bilanzDaten") if isinstance(row.get("bilanzDaten"), dict) else {}
         guv = row.get("guvDaten") if isinstance(row.get("guvDaten"), dict) else {}
@@ -697,138 +991,58 @@ def upsert_financial_blocks(client: Client, firmennummer: str, rows: List[Dict[s
         bilanz_k = kennzahlen.get("bilanzKennzahlen") if isinstance(kennzahlen.get("bilanzKennzahlen"), dict) else {}
         guv_k = kennzahlen.get("guvKennzahlen") if isinstance(kennzahlen.get("guvKennzahlen"), dict) else {}
 
-        client.table("ofb_financial_bilanz").upsert(
-            {
-                "financial_year_id": financial_year_id,
-                "bilanz_summe": bilanz.get("bilanzSumme"),
-                "bilanz_summe_vj": bilanz.get("bilanzSummeVJ"),
-                "anlage_vermoegen": bilanz.get("anlageVermoegen"),
-                "anlage_vermoegen_vj": bilanz.get("anlageVermoegenVJ"),
-                "immaterielle_vermoegensgegenstaende": bilanz.get("immaterielleVermoegensgegenstaende"),
-                "aktivierte_eigenleistungen": bilanz.get("aktivierteEigenleistungen"),
-                "sachanlagen": bilanz.get("sachanlagen"),
-                "finanzanlagen": bilanz.get("finanzanlagen"),
-                "umlaufvermoegen": bilanz.get("umlaufvermoegen"),
-                "vorraete": bilanz.get("vorraete"),
-                "vorraete_vj": bilanz.get("vorraeteVJ"),
-                "forderungen": bilanz.get("forderungen"),
-                "forderungen_vj": bilanz.get("forderungenVJ"),
-                "forderungen_lieferungen": bilanz.get("forderungenLieferungen"),
-                "wertpapiere": bilanz.get("wertpapiere"),
-                "liquides_vermoegen": bilanz.get("liquidesVermoegen"),
-                "liquides_vermoegen_vj": bilanz.get("liquidesVermoegenVJ"),
-                "rechnungsabgrenzungen": bilanz.get("rechnungsabgrenzungen"),
-                "eigenkapital": bilanz.get("eigenkapital"),
-                "eigenkapital_vj": bilanz.get("eigenkapitalVJ"),
-                "eingefordertes_stammkapital": bilanz.get("eingefordertesStammkapital"),
-                "kapitalruecklagen": bilanz.get("kapitalruecklagen"),
-                "gewinnruecklagen": bilanz.get("gewinnruecklagen"),
-                "gewinnruecklagen_vj": bilanz.get("gewinnruecklagenVJ"),
-                "bilanzgewinn": bilanz.get("bilanzgewinn"),
-                "vortrag": bilanz.get("vortrag"),
-                "vortrag_vj": bilanz.get("vortragVJ"),
-                "rueckstellungen": bilanz.get("rueckstellungen"),
-                "rueckstellungen_vj": bilanz.get("rueckstellungenVJ"),
-                "verbindlichkeiten": bilanz.get("verbindlichkeiten"),
-                "verbindlichkeiten_vj": bilanz.get("verbindlichkeitenVJ"),
-                "langfristige_verbindlichkeiten": bilanz.get("langfristigeVerbindlichkeiten"),
-                "kurzfristige_verbindlichkeiten": bilanz.get("kurzfristigeVerbindlichkeiten"),
-                "verbindlichkeiten_lieferungen": bilanz.get("verbindlichkeitenLieferungen"),
-                "langfristige_forderungen": bilanz.get("langfristigeForderungen"),
-                "kurzfristige_forderungen": bilanz.get("kurzfristigeForderungen"),
-                "passive_rechnungsabgrenzungen": bilanz.get("passiveRechnungsabgrenzungen"),
-                "raw_row": bilanz,
-            },
-            on_conflict="financial_year_id",
-        ).execute()
+        for target, source, fields, mapped_keys in (
+            (bilanz_rows, bilanz, _BILANZ_FIELDS, _BILANZ_KEYS),
+            (guv_rows, guv, _GUV_FIELDS, _GUV_KEYS),
+            (kennzahlen_bilanz_rows, bilanz_k, _BILANZ_KENNZAHLEN_FIELDS, _BILANZ_KENNZAHLEN_KEYS),
+            (kennzahlen_guv_rows, guv_k, _GUV_KENNZAHLEN_FIELDS, _GUV_KENNZAHLEN_KEYS),
+        ):
+            source_get = source.get
+            values = {column: source_get(key) for key, column in fields}
+            # A block without a single value would only write a row of nulls.
+            if all(value is None for value in values.values()):
+                continue
+            mapped = {"financial_year_id": financial_year_id}
+            mapped.update(values)
+            # Only keys without a column of their own; the full OFB row stays on ofb_financial_years.raw_row.
+            mapped["raw_row"] = {key: value for key, value in source.items() if key not in mapped_keys} or None
+            target.append(mapped)
 
-        client.table("ofb_financial_guv").upsert(
-            {
-                "financial_year_id": financial_year_id,
-                "betriebs_erfolg": guv.get("betriebsErfolg"),
-                "betriebs_erfolg_vj": guv.get("betriebsErfolgVJ"),
-                "umsatzerloese": guv.get("umsatzerloese"),
-                "umsatzerloese_vj": guv.get("umsatzerloeseVJ"),
-                "waren_und_materialeinkauf": guv.get("warenUndMaterialeinkauf"),
-                "waren_und_materialeinkauf_vj": guv.get("warenUndMaterialeinkaufVJ"),
-                "jahresueberschuss": guv.get("jahresueberschuss"),
-                "jahresueberschuss_vj": guv.get("jahresueberschussVJ"),
-                "bestandsveraenderung": guv.get("bestandsveraenderung"),
-                "bestandsveraenderung_vj": guv.get("bestandsveraenderungVJ"),
-                "personalaufwand": guv.get("personalaufwand"),
-                "personalaufwand_vj": guv.get("personalaufwandVJ"),
-                "steueraufwand": guv.get("steueraufwand"),
-                "ergebnis_vor_steuern": guv.get("ergebnisVorSteuern"),
-                "zinsen_und_aehnliche_aufwendungen": guv.get("zinsenUndAehnlicheAufwendungen"),
-                "abschreibungen": guv.get("abschreibungen"),
-                "sonstige_betriebliche_ertraege": guv.get("sonstigeBetrieblicheErtraege"),
-                "soziale_aufwendungen": guv.get("sozialeAufwendungen"),
-                "sonstige_betriebliche_aufwendungen": guv.get("sonstigeBetrieblicheAufwendungen"),
-                "ertraege_aus_beteiligungen": guv.get("ertraegeAusBeteiligungen"),
-                "ertraege_aus_wertpapieren": guv.get("ertraegeAusWertpapieren"),
-                "sonstige_zinsen_und_aehnliche_ertraege": guv.get("sonstigeZinsenUndAehnlicheErtraege"),
-                "aufwendungen_aus_finanzanlagen": guv.get("aufwendungenAusFinanzanlagen"),
-                "finanzerfolg": guv.get("finanzerfolg"),
-                "aufloesung_gewinnruecklagen": guv.get("aufloesungGewinnruecklagen"),
-                "raw_row": guv,
-            },
-            on_conflict="financial_year_id",
-        ).execute()
+    if bilanz_rows or guv_rows or kennzahlen_bilanz_rows or kennzahlen_guv_rows:
+        upsert_financial_children(client, bilanz_rows, guv_rows, kennzahlen_bilanz_rows, kennzahlen_guv_rows)
+    return years_mapped
 
-        client.table("ofb_financial_kennzahlen_bilanz").upsert(
-            {
-                "financial_year_id": financial_year_id,
-                "eigenkapitalquote": bilanz_k.get("eigenkapitalquote"),
-                "fremdkapitalquote": bilanz_k.get("fremdkapitalquote"),
-                "anlagendeckungsgrad": bilanz_k.get("anlagendeckungsgrad"),
-                "anlagendeckungsgrad2": bilanz_k.get("anlagendeckungsgrad2"),
-                "liquiditaet_grad1": bilanz_k.get("liquiditaetGrad1"),
-                "liquiditaet_grad2": bilanz_k.get("liquiditaetGrad2"),
-                "liquiditaet_grad3": bilanz_k.get("liquiditaetGrad3"),
-                "working_capital": bilanz_k.get("workingCapital"),
-                "anlagenintensitaet": bilanz_k.get("anlagenintensitaet"),
-                "umlaufintensitaet": bilanz_k.get("umlaufintensitaet"),
-                "verschuldungsgrad": bilanz_k.get("verschuldungsgrad"),
-                "investiertes_kapital": bilanz_k.get("investiertesKapital"),
-                "veraenderung_liquider_mittel": bilanz_k.get("veraenderungLiquiderMittel"),
-                "return_on_equity": bilanz_k.get("returnOnEquity"),
-                "return_on_equity_simplified": bilanz_k.get("returnOnEquitySimplified"),
-                "return_on_assets": bilanz_k.get("returnOnAssets"),
-                "return_on_assets_simplified": bilanz_k.get("returnOnAssetsSimplified"),
-                "raw_row": bilanz_k,
-            },
-            on_conflict="financial_year_id",
-        ).execute()
 
-        client.table("ofb_financial_kennzahlen_guv").upsert(
+def upsert_financial_children(
+    client: Client,
+    bilanz_rows: List[Dict[str, Any]],
+    guv_rows: List[Dict[str, Any]],
+    kennzahlen_bilanz_rows: List[Dict[str, Any]],
+    kennzahlen_guv_rows: List[Dict[str, Any]],
+) -> None:
+    try:
+        client.rpc(
+            "ofb_upsert_financial_children",
             {
-                "financial_year_id": financial_year_id,
-                "ebit_marge": guv_k.get("ebitMarge"),
-                "nettomarge": guv_k.get("nettomarge"),
-                "materialquote": guv_k.get("materialquote"),
-                "personalquote": guv_k.get("personalquote"),
-                "umsatzwachstum_kurz": guv_k.get("umsatzwachstumKurz"),
-                "effektiver_steuersatz": guv_k.get("effektiverSteuersatz"),
-                "investitionsquote": guv_k.get("investitionsquote"),
-                "debitoren_umschlagshaeufigkeit": guv_k.get("debitorenUmschlagshaeufigkeit"),
-                "kreditoren_umschlagshaeufigkeit": guv_k.get("kreditorenUmschlagshaeufigkeit"),
-                "bruttomarge": guv_k.get("bruttomarge"),
-                "ausschuettungen": guv_k.get("ausschuettungen"),
-                "return_on_invested_capital": guv_k.get("returnOnInvestedCapital"),
-                "operativer_cashflow": guv_k.get("operativerCashflow"),
-                "cashflow_quote": guv_k.get("cashflowQuote"),
-                "lagerumschlagsdauer": guv_k.get("lagerumschlagsdauer"),
-                "forderungsumschlagsdauer": guv_k.get("forderungsumschlagsdauer"),
-                "verbindlichkeitsdauer": guv_k.get("verbindlichkeitsdauer"),
-                "cash_conversion_cycle": guv_k.get("cashConversionCycle"),
-                "fcf": guv_k.get("FCF"),
-                "capex": guv_k.get("CAPEX"),
-                "raw_row": guv_k,
+                "p_bilanz": bilanz_rows,
+                "p_guv": guv_rows,
+                "p_kennzahlen_bilanz": kennzahlen_bilanz_rows,
+                "p_kennzahlen_guv": kennzahlen_guv_rows,
             },
-            on_conflict="financial_year_id",
         ).execute()
-        total += 1
-    return total
+        return
+    except Exception as exc:
+        if not is_missing_rpc_function_error(exc):
+            raise
+    # Schema predates the rpc: fall back to one upsert per table.
+    for table, table_rows in (
+        ("ofb_financial_bilanz", bilanz_rows),
+        ("ofb_financial_guv", guv_rows),
+        ("ofb_financial_kennzahlen_bilanz", kennzahlen_bilanz_rows),
+        ("ofb_financial_kennzahlen_guv", kennzahlen_guv_rows),
+    ):
+        if table_rows:
+            client.table(table).upsert(table_rows, on_conflict="financial_year_id").execute()
 
 
 def resolve_firmennummer_via_search(client: Client, search_name: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
@@ -866,69 +1080,94 @@ def crawl_one_queue_item(client: Client, item: Dict[str, Any], stichtag: str, um
         firmennummer, best_search_row = resolve_firmennummer_via_search(client, search_name)
         if not firmennummer:
             # No match found: postpone but keep as pending.
+            now = dt.datetime.now(dt.timezone.utc)
             client.table("ofb_crawl_queue").update(
                 {
                     "status": "pending",
                     "attempts": int(item.get("attempts") or 0) + 1,
-                    "next_run_at": (dt.datetime.now(dt.timezone.utc) + dt.timedelta(hours=12)).isoformat(),
-                    "updated_at": now_utc_iso(),
+                    "next_run_at": (now + dt.timedelta(hours=12)).isoformat(),
+                    "updated_at": now.isoformat(),
                 }
             ).eq("id", queue_id).execute()
             return {"ok": False, "reason": "no_match"}
 
-    cleaned_fnr = normalize_fnr(firmennummer)
-    if not cleaned_fnr:
-        raise RuntimeError("Could not resolve firmennummer")
+    # Both branches above yield an already-normalized, non-empty FNR.
+    cleaned_fnr = firmennummer
 
     extract_payload = {"FNR": cleaned_fnr, "STICHTAG": stichtag, "UMFANG": umfang}
-    extract_response = ofb_post_json("/firmenbuch/auszug", extract_payload)
-    if not isinstance(extract_response, dict):
-        raise RuntimeError("Unexpected /auszug response format")
-
-    snapshot_id = get_or_create_snapshot(client, cleaned_fnr, stichtag, umfang, extract_response)
-    euid = replace_snapshot_children(client, snapshot_id, extract_response)
-
-    financial_response = ofb_post_json("/firmenbuch/urkunde/daten/multiple", {"FNR": cleaned_fnr})
-    financial_rows = financial_response if isinstance(financial_response, list) else []
+    # /auszug and /urkunde only depend on the FNR: fetch the financials while the extract is in flight.
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        financial_future = prefetch.submit(ofb_post_json_list, "/firmenbuch/urkunde/daten/multiple", {"FNR": cleaned_fnr})
+        extract_response = ofb_post_json_dict("/firmenbuch/auszug", extract_payload)
+        snapshot_id = get_or_create_snapshot(client, cleaned_fnr, stichtag, umfang, extract_response)
+        euid = replace_snapshot_children(client, snapshot_id, extract_response)
+
+        financial_rows = financial_future.result()
     years_upserted = upsert_financial_blocks(client, cleaned_fnr, financial_rows)
 
+    # One timestamp for all bookkeeping writes, taken after the slow API and child writes.
+    finished = dt.datetime.now(dt.timezone.utc)
+    finished_iso = finished.isoformat()
     if best_search_row:
-        upsert_company_from_search(client, best_search_row, euid=euid)
+        company = company_payload_from_search(best_search_row, euid=euid, seen_at=finished_iso)
     else:
-        client.table("ofb_companies").upsert(
-            {"firmennummer": cleaned_fnr, "euid": euid, "last_seen_at": now_utc_iso(), "updated_at": now_utc_iso()},
-            on_conflict="firmennummer",
-        ).execute()
+        company = {"firmennummer": cleaned_fnr, "euid": euid, "last_seen_at": finished_iso, "updated_at": finished_iso}
+    link = {
+        "firmennummer": cleaned_fnr,
+        "source_system": source_system,
+        "source_key": source_key,
+        "source_name": item.get("source_name"),
+        "confidence": 1.0 if best_search_row else 0.8,
+        "matched_at": finished_iso,
+    }
+    queue_update = {
+        "firmennummer": cleaned_fnr,
+        "status": "done",
+        "attempts": int(item.get("attempts") or 0) + 1,
+        "last_run_at": finished_iso,
+        "next_run_at": (finished + dt.timedelta(days=30)).isoformat(),
+        "last_error": None,
+        "updated_at": finished_iso,
+    }
+    finalize_crawl(client, queue_id, company, link, queue_update)
 
-    client.table("ofb_company_source_links").upsert(
-        {
-            "firmennummer": cleaned_fnr,
-            "source_system": source_system,
-            "source_key": source_key,
-            "source_name": item.get("source_name"),
-            "confidence": 1.0 if best_search_row else 0.8,
-            "matched_at": now_utc_iso(),
-        },
-        on_conflict="source_system,source_key",
-    ).execute()
+    return {"ok": True, "firmennummer": cleaned_fnr, "snapshot_id": snapshot_id, "years_upserted": years_upserted}
 
-    client.table("ofb_crawl_queue").update(
-        {
-            "firmennummer": cleaned_fnr,
-            "status": "done",
-            "attempts": int(item.get("attempts") or 0) + 1,
-            "last_run_at": now_utc_iso(),
-            "next_run_at": (dt.datetime.now(dt.timezone.utc) + dt.timedelta(days=30)).isoformat(),
-            "last_error": None,
-            "updated_at": now_utc_iso(),
-        }
-    ).eq("id", queue_id).execute()
 
-    return {"ok": True, "firmennummer": cleaned_fnr, "snapshot_id": snapshot_id, "years_upserted": years_upserted}
+def finalize_crawl(
+    client: Client,
+    queue_id: str,
+    company: Optional[Dict[str, Any]],
+    link: Dict[str, Any],
+    queue_update: Dict[str, Any],
+) -> None:
+    try:
+        client.rpc(
+            "ofb_finalize_crawl",
+            {"p_company": company, "p_link": link, "p_queue_id": queue_id, "p_queue": queue_update},
+        ).execute()
+        return
+    except Exception as exc:
+        if not is_missing_rpc_function_error(exc):
+            raise
+    # Schema predates the rpc: company, source link and queue row one call each.
+    if company:
+        client.table("ofb_companies").upsert(company, on_conflict="firmennummer").execute()
+    client.table("ofb_company_source_links").upsert(link, on_conflict="source_system,source_key").execute()
+    client.table("ofb_crawl_queue").update(queue_update).eq("id", queue_id).execute()
 
 
 def claim_queue_batch(client: Client, batch_size: int) -> List[Dict[str, Any]]:
-    now = now_utc_iso()
+    try:
+        claimed = client.rpc("ofb_claim_queue", {"p_batch": batch_size, "p_lease_minutes": CLAIM_LEASE_MINUTES}).execute()
+        return list(getattr(claimed, "data", None) or [])
+    except Exception as exc:
+        if not is_missing_rpc_function_error(exc):
+            raise
+    # Schema predates the rpc: select, then compare-and-swap each row.
+    claimed_at = dt.datetime.now(dt.timezone.utc)
+    now = claimed_at.isoformat()
+    lease_until = (claimed_at + dt.timedelta(minutes=CLAIM_LEASE_MINUTES)).isoformat()
     resp = (
         client.table("ofb_crawl_queue")
         .select("*")
@@ -947,7 +1186,7 @@ def claim_queue_batch(client: Client, batch_size: int) -> List[Dict[str, Any]]:
             continue
         update_resp = (
             client.table("ofb_crawl_queue")
-            .update({"status": "running", "last_run_at": now, "updated_at": now})
+            .update({"status": "running", "last_run_at": now, "next_run_at": lease_until, "updated_at": now})
             .eq("id", queue_id)
             .eq("status", row.get("status"))
             .execute()
@@ -959,98 +1198,149 @@ def claim_queue_batch(client: Client, batch_size: int) -> List[Dict[str, Any]]:
 
 
 def mark_failed(client: Client, queue_id: str, previous_attempts: int, error_text: str) -> None:
+    try:
+        client.rpc("ofb_mark_failed", {"p_queue_id": queue_id, "p_error": error_text}).execute()
+        return
+    except Exception as exc:
+        if not is_missing_rpc_function_error(exc):
+            raise
+    # Schema predates the rpc: compute the backoff from the attempts seen at claim time.
     attempts = int(previous_attempts or 0) + 1
     wait_minutes = min(24 * 60, 10 * (2 ** min(6, attempts)))
-    next_run = dt.datetime.now(dt.timezone.utc) + dt.timedelta(minutes=wait_minutes)
+    now = dt.datetime.now(dt.timezone.utc)
+    next_run = now + dt.timedelta(minutes=wait_minutes)
     client.table("ofb_crawl_queue").update(
         {
             "status": "failed",
             "attempts": attempts,
             "last_error": error_text[:900],
             "next_run_at": next_run.isoformat(),
-            "updated_at": now_utc_iso(),
+            "updated_at": now.isoformat(),
         }
     ).eq("id", queue_id).execute()
 
 
-def run_once(
-    client: Client,
-    seed_max_rows_per_source: int,
-    batch_size: int,
-    stichtag: str,
-    umfang: str,
-) -> Dict[str, Any]:
-    seeded = seed_queue_from_sources(client, max_rows_per_source=seed_max_rows_per_source)
-    claimed = claim_queue_batch(client, batch_size=batch_size)
-    stats = {
-        "seeded": seeded,
-        "claimed": len(claimed),
-        "ok": 0,
-        "failed": 0,
-        "no_match": 0,
-    }
-    for item in claimed:
-        queue_id = str(item["id"])
-        try:
-            result = crawl_one_queue_item(client, item=item, stichtag=stichtag, umfang=umfang)
-            if result.get("ok"):
-                stats["ok"] += 1
-            elif result.get("reason") == "no_match":
-                stats["no_match"] += 1
-            else:
-                stats["failed"] += 1
-        except urllib.error.HTTPError as exc:
-            mark_failed(client, queue_id=queue_id, previous_attempts=int(item.get("attempts") or 0), error_text=f"HTTP {exc.code}: {exc.reason}")
-            stats["failed"] += 1
-        except urllib.error.URLError as exc:
-            mark_failed(client, queue_id=queue_id, previous_attempts=int(item.get("attempts") or 0), error_text=f"Network error: {exc.reason}")
-            stats["failed"] += 1
-        except Exception as exc:
-            mark_failed(client, queue_id=queue_id, previous_attempts=int(item.get("attempts") or 0), error_text=str(exc))
-            stats["failed"] += 1
-    return stats
+def process_queue_item(client: Client, item: Dict[str, Any], stichtag: str, umfang: str) -> str:
+    queue_id = str(item["id"])
+    try:
+        result = crawl_one_queue_item(client, item=item, stichtag=stichtag, umfang=umfang)
+        if result.get("ok"):
+            return "ok"
+        if result.get("reason") == "no_match":
+            return "no_match"
+        return "failed"
+    except requests.HTTPError as exc:
+        status = exc.response.status_code if exc.response is not None else "?"
+        reason = exc.response.reason if exc.response is not None else str(exc)
+        mark_failed(client, queue_id=queue_id, previous_attempts=int(item.get("attempts") or 0), error_text=f"HTTP {status}: {reason}")
+    except requests.RequestException as exc:
+        mark_failed(client, queue_id=queue_id, previous_attempts=int(item.get("attempts") or 0), error_text=f"Network error: {exc}")
+    except Exception as exc:
+        mark_failed(client, queue_id=queue_id, previous_attempts=int(item.get("attempts") or 0), error_text=str(exc))
+    return "failed"
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Continuous OpenFirmenbuch API crawler")
     parser.add_argument("--batch-size", type=int, default=20, help="Queue items processed per cycle")
     parser.add_argument("--seed-max-rows-per-source", type=int, default=3000, help="Max rows fetched per source table each cycle")
-    parser.add_argument("--stichtag", type=str, default=today_iso(), help="As-of date for /firmenbuch/auszug (YYYY-MM-DD)")
+    parser.add_argument("--stichtag", type=str, default=None, help="As-of date for /firmenbuch/auszug (YYYY-MM-DD, default: today per cycle)")
     parser.add_argument("--umfang", type=str, default="Kurzinformation", help="UMFANG parameter for /firmenbuch/auszug")
     parser.add_argument("--cycles", type=int, default=0, help="Number of cycles to run (default: endless; set >0 for finite)")
-    parser.add_argument("--sleep-seconds", type=float, default=5.0, help="Sleep between cycles")
+    parser.add_argument("--sleep-seconds", type=float, default=5.0, help="Sleep after a cycle that claimed nothing")
+    parser.add_argument("--concurrency", type=int, default=OPENFIRMENBUCH_MAX_CONCURRENCY, help="Queue items crawled concurrently per cycle")
     return parser.parse_args()
 
 
-def main() -> None:
+def print_cycle_stats(cycle_no: int, stats: Dict[str, Any], started: float) -> None:
+    elapsed = time.time() - started
+    print(
+        f"[cycle={cycle_no}] seeded={stats['seeded']} claimed={stats['claimed']} "
+        f"ok={stats['ok']} no_match={stats['no_match']} failed={stats['failed']} "
+        f"elapsed={elapsed:.1f}s"
+    )
+
+
+async def run_pipeline(
+    client: Client,
+    seed_max_rows_per_source: int,
+    batch_size: int,
+    stichtag: Optional[str],
+    umfang: str,
+    concurrency: int,
+    sleep_seconds: float,
+    cycles: int = 0,
+) -> None:
+    # Producer/consumer: the claimer seeds and claims the next batch while workers still drain
+    # the current one, so a slow item no longer holds up the whole cycle.
+    queue: asyncio.Queue = asyncio.Queue()
+    low_water = max(1, batch_size // 2)
+
+    async def claimer() -> None:
+        cycle_no = 0
+        consecutive_empty = 0
+        while cycles <= 0 or cycle_no < cycles:
+            if queue.qsize() >= low_water:
+                await asyncio.sleep(0.2)
+                continue
+            cycle_no += 1
+            started = time.time()
+            seeded = await asyncio.to_thread(seed_queue_from_sources, client, seed_max_rows_per_source)
+            claimed = await asyncio.to_thread(claim_queue_batch, client, batch_size)
+            stats = {"seeded": seeded, "claimed": len(claimed), "ok": 0, "failed": 0, "no_match": 0}
+            if not claimed:
+                print_cycle_stats(cycle_no, stats, started)
+                # Back off while the queue stays drained; the next successful claim resets it.
+                idle_sleep = max(sleep_seconds, min(IDLE_SLEEP_MAX_SECONDS, sleep_seconds * (2 ** consecutive_empty)))
+                consecutive_empty += 1
+                await asyncio.sleep(idle_sleep + random.uniform(0.0, 0.5))
+                continue
+            consecutive_empty = 0
+            batch = {
+                "cycle_no": cycle_no,
+                "stats": stats,
+                "started": started,
+                "pending": len(claimed),
+                # Resolved per cycle so a long-running crawler follows the calendar.
+                "stichtag": stichtag or today_iso(),
+            }
+            for item in claimed:
+                queue.put_nowait((batch, item))
+        for _ in range(concurrency):
+            queue.put_nowait(None)
+
+    async def worker() -> None:
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            batch, item = entry
+            outcome = await asyncio.to_thread(process_queue_item, client, item, batch["stichtag"], umfang)
+            batch["stats"][outcome] += 1
+            batch["pending"] -= 1
+            if batch["pending"] == 0:
+                print_cycle_stats(batch["cycle_no"], batch["stats"], batch["started"])
+
+    await asyncio.gather(claimer(), *(worker() for _ in range(concurrency)))
+
+
+async def main() -> None:
     args = parse_args()
     client = create_client_from_env()
-    ensure_openfirmenbuch_tables_ready(client)
+    await asyncio.to_thread(ensure_openfirmenbuch_tables_ready, client)
     print("Schema preflight passed: OpenFirmenbuch tables are reachable.")
 
-    cycles = int(args.cycles)
-    cycle_no = 0
-    while True:
-        cycle_no += 1
-        started = time.time()
-        stats = run_once(
-            client=client,
-            seed_max_rows_per_source=max(1, int(args.seed_max_rows_per_source)),
-            batch_size=max(1, int(args.batch_size)),
-            stichtag=args.stichtag,
-            umfang=args.umfang,
-        )
-        elapsed = time.time() - started
-        print(
-            f"[cycle={cycle_no}] seeded={stats['seeded']} claimed={stats['claimed']} "
-            f"ok={stats['ok']} no_match={stats['no_match']} failed={stats['failed']} "
-            f"elapsed={elapsed:.1f}s"
-        )
-
-        if cycles > 0 and cycle_no >= cycles:
-            break
-        time.sleep(max(0.0, float(args.sleep_seconds)) + random.uniform(0.0, 0.5))
+    await run_pipeline(
+        client=client,
+        seed_max_rows_per_source=max(1, int(args.seed_max_rows_per_source)),
+        batch_size=max(1, int(args.batch_size)),
+        stichtag=args.stichtag,
+        umfang=args.umfang,
+        concurrency=max(1, int(args.concurrency)),
+        sleep_seconds=max(0.0, float(args.sleep_seconds)),
+        cycles=int(args.cycles),
+    )
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -6,15 +6,22 @@ import csv
 import json
 import os
 import re
+from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
 
 ROOT = Path(__file__).resolve().parent.parent
 SCRIPTS_DIR = ROOT / "scripts"
 DATA_DIR = ROOT / "data"
+DATA_FILE_SUFFIXES = (".json", ".jsonl", ".csv", ".xlsx")
 
 
 TABLE_RE = re.compile(
@@ -26,6 +33,8 @@ INDEX_RE = re.compile(
     flags=re.IGNORECASE | re.DOTALL,
 )
 
+SQL_ITEM_DELIM_RE = re.compile(r"[,()]")
+
 
 @dataclass
 class Column:
@@ -67,23 +76,22 @@ def parse_args() -> argparse.Namespace:
 
 
 def split_sql_items(block: str) -> list[str]:
+    # Jump between delimiters instead of walking the block character by character.
     items: list[str] = []
-    current: list[str] = []
     depth = 0
-    for ch in block:
-        if ch == "(":
+    start = 0
+    for match in SQL_ITEM_DELIM_RE.finditer(block):
+        delim = match.group()
+        if delim == "(":
             depth += 1
-        elif ch == ")":
+        elif delim == ")":
             depth -= 1
-
-        if ch == "," and depth == 0:
-            item = "".join(current).strip()
+        elif depth == 0:
+            item = block[start : match.start()].strip()
             if item:
                 items.append(item)
-            current = []
-            continue
-        current.append(ch)
-    tail = "".join(current).strip()
+            start = match.end()
+    tail = block[start:].strip()
     if tail:
         items.append(tail)
     return items
@@ -174,6 +182,15 @@ def parse_datetime_value(value: Any) -> datetime | None:
     if not txt:
         return None
 
+    # Fast path for the common dd.mm.yyyy shape: strptime re-parses its format on every call.
+    if len(txt) == 10 and txt[2] == "." and txt[5] == "." and txt.isascii():
+        day, month, year = txt[:2], txt[3:5], txt[6:]
+        if day.isdigit() and month.isdigit() and year.isdigit():
+            try:
+                return datetime(int(year), int(month), int(day))
+            except ValueError:
+                return None
+
     date_formats = (
         "%Y-%m-%d",
         "%Y-%m-%dT%H:%M:%S",
@@ -196,7 +213,9 @@ def parse_datetime_value(value: Any) -> datetime | None:
 
 def parse_jsonl_file(path: Path, sample_rows: int) -> dict[str, Any]:
     keys: set[str] = set()
-    key_counts: dict[str, int] = {}
+    key_counts: defaultdict[str, int] = defaultdict(int)
+    # Decided once per distinct key instead of once per key occurrence.
+    is_date_key: dict[str, bool] = {}
     sampled = 0
     total_nonempty_lines = 0
     total_valid_rows = 0
@@ -204,15 +223,16 @@ def parse_jsonl_file(path: Path, sample_rows: int) -> dict[str, Any]:
     date_min: dict[str, datetime] = {}
     date_max: dict[str, datetime] = {}
 
-    with path.open("r", encoding="utf-8") as fh:
+    # Both parsers take the raw line bytes, so lines are never decoded to str first.
+    loads = orjson.loads if orjson is not None else json.loads
+    with path.open("rb") as fh:
         for line in fh:
-            line = line.strip()
-            if not line:
+            if not line.strip():
                 continue
             total_nonempty_lines += 1
             try:
-                row = json.loads(line)
-            except json.JSONDecodeError:
+                row = loads(line)
+            except ValueError:
                 parse_errors += 1
                 continue
             total_valid_rows += 1
@@ -220,10 +240,14 @@ def parse_jsonl_file(path: Path, sample_rows: int) -> dict[str, Any]:
                 if sampled < sample_rows:
                     for key, value in row.items():
                         keys.add(key)
-                        if value is not None and str(value).strip() != "":
-                            key_counts[key] = key_counts.get(key, 0) + 1
-
-                        if key.endswith("_at") or "date" in key.lower():
+                        # Only strings can be blank; str() of any other non-None value never is.
+                        if value is not None and (not isinstance(value, str) or value.strip()):
+                            key_counts[key] += 1
+
+                        date_key = is_date_key.get(key)
+                        if date_key is None:
+                            date_key = is_date_key[key] = key.endswith("_at") or "date" in key.lower()
+                        if date_key:
                             dt = parse_datetime_value(value)
                             if dt is None:
                                 continue
@@ -255,16 +279,13 @@ def parse_jsonl_file(path: Path, sample_rows: int) -> dict[str, Any]:
 
 
 def collect_data_files() -> list[Path]:
+    # One walk of data/ and one scan of the repo root, instead of a glob pass per suffix.
     files: list[Path] = []
     if DATA_DIR.exists():
-        files.extend(DATA_DIR.rglob("*.json"))
-        files.extend(DATA_DIR.rglob("*.jsonl"))
-        files.extend(DATA_DIR.rglob("*.csv"))
-        files.extend(DATA_DIR.rglob("*.xlsx"))
-    files.extend(ROOT.glob("*.json"))
-    files.extend(ROOT.glob("*.jsonl"))
-    files.extend(ROOT.glob("*.csv"))
-    files.extend(ROOT.glob("*.xlsx"))
+        for dirpath, _, filenames in os.walk(DATA_DIR):
+            files.extend(Path(dirpath) / name for name in filenames if name.endswith(DATA_FILE_SUFFIXES))
+    with os.scandir(ROOT) as entries:
+        files.extend(Path(entry.path) for entry in entries if entry.name.endswith(DATA_FILE_SUFFIXES) and entry.is_file())
     deduped = sorted(set(files))
     return deduped
 
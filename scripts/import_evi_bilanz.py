@@ -7,19 +7,31 @@ import json
 import os
 import re
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable
 
 from dotenv import find_dotenv, load_dotenv
 from supabase import Client, create_client
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
 SCHEMA_SQL_PATH = Path(__file__).resolve().parent / "setup_evi_schema.sql"
 DEFAULT_JSONL_CANDIDATES = (
     Path("data/out/evi_bilanz.jsonl"),
     Path("data/evi_bilanz.jsonl"),
 )
 
+# Below this size the process pool costs more than it saves.
+PARALLEL_PREPARE_MIN_BYTES = 10 * 1024 * 1024
+
+_DMY_DATE_RE = re.compile(r"\d{2}\.\d{2}\.\d{4}")
+
 UMLAUT_TRANSLATION = str.maketrans(
     {
         "ä": "ae",
@@ -33,6 +45,19 @@ UMLAUT_TRANSLATION = str.maketrans(
 )
 
 
+# str.translate table that keeps a-z, 0-9 and whitespace and maps everything else to a space;
+# filled lazily, so it only holds code points that actually occurred.
+class _ScrubTable(dict):
+    def __missing__(self, codepoint: int) -> str:
+        ch = chr(codepoint)
+        kept = ch if ("a" <= ch <= "z" or "0" <= ch <= "9" or ch.isspace()) else " "
+        self[codepoint] = kept
+        return kept
+
+
+_SCRUB_TABLE = _ScrubTable()
+
+
 def as_text(value: Any) -> str | None:
     if value is None:
         return None
@@ -43,12 +68,22 @@ def as_text(value: Any) -> str | None:
 def normalize_text(value: Any) -> str:
     if value is None:
         return ""
-    text = str(value).strip().lower().translate(UMLAUT_TRANSLATION)
-    text = unicodedata.normalize("NFKD", text)
-    text = "".join(ch for ch in text if not unicodedata.combining(ch))
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    return _normalize_text_cached(str(value))
+
+
+def _normalize_text(text: str) -> str:
+    text = text.strip().lower().translate(UMLAUT_TRANSLATION)
+    if not text.isascii():
+        # NFKD plus dropping combining marks can only change non-ASCII text.
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    # Same result as re.sub(r"[^a-z0-9\s]", " ") followed by collapsing \s+, without the regex engine.
+    return " ".join(text.translate(_SCRUB_TABLE).split())
+
+
+# Company names, FNRs, publication types and dates repeat heavily across the JSONL; detail URLs do not
+# and bypass the cache.
+_normalize_text_cached = lru_cache(maxsize=65536)(_normalize_text)
 
 
 def to_iso_timestamptz(value: Any) -> str | None:
@@ -66,7 +101,7 @@ def to_iso_date(value: Any) -> str | None:
     txt = as_text(value)
     if not txt:
         return None
-    if re.fullmatch(r"\d{2}\.\d{2}\.\d{4}", txt):
+    if _DMY_DATE_RE.fullmatch(txt):
         try:
             dt = datetime.strptime(txt, "%d.%m.%Y")
             return dt.date().isoformat()
@@ -161,76 +196,124 @@ def locate_jsonl(explicit_path: str | None) -> Path:
 
 
 def build_evi_key(detail_url: str | None, company_name: str | None, publication_date: str | None) -> str:
-    key_material = "|".join([detail_url or "", company_name or "", publication_date or ""])
+    key_material = f"{detail_url or ''}|{company_name or ''}|{publication_date or ''}"
     return hashlib.sha1(key_material.encode("utf-8")).hexdigest()
 
 
 def prepare_records(jsonl_path: Path) -> tuple[list[dict[str, Any]], int]:
+    size = jsonl_path.stat().st_size
+    workers = os.cpu_count() or 1
+    if size < PARALLEL_PREPARE_MIN_BYTES or workers < 2:
+        with jsonl_path.open("rb") as fh:
+            return prepare_lines(fh)
+
+    # Large files: every worker parses its own line-aligned byte range; pool.map keeps file order,
+    # so later rows still come last.
+    ranges = line_aligned_ranges(jsonl_path, size, workers)
     records: list[dict[str, Any]] = []
     skipped = 0
-    with jsonl_path.open("r", encoding="utf-8") as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                row = json.loads(line)
-            except json.JSONDecodeError:
-                skipped += 1
-                continue
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        starts = [start for start, _ in ranges]
+        ends = [end for _, end in ranges]
+        for chunk_records, chunk_skipped in pool.map(prepare_range, [str(jsonl_path)] * len(ranges), starts, ends):
+            records.extend(chunk_records)
+            skipped += chunk_skipped
+    return records, skipped
 
-            detail_url = as_text(row.get("detail_url"))
-            company_name = as_text(row.get("company_name"))
-            publication_type = as_text(row.get("publication_type"))
-            firmenbuchnummer = as_text(row.get("firmenbuchnummer"))
-            publication_date = to_iso_date(row.get("publication_date"))
-            crawled_at = to_iso_timestamptz(row.get("crawled_at"))
-            company_name_norm = normalize_text(company_name)
 
-            if not detail_url and not company_name:
-                skipped += 1
-                continue
+def line_aligned_ranges(jsonl_path: Path, size: int, parts: int) -> list[tuple[int, int]]:
+    offsets = [0]
+    with jsonl_path.open("rb") as fh:
+        for part in range(1, parts):
+            fh.seek(size * part // parts)
+            fh.readline()
+            offsets.append(fh.tell())
+    offsets.append(size)
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if start < end]
 
-            search_text = normalize_text(
-                " ".join(
-                    token
-                    for token in [
-                        company_name or "",
-                        firmenbuchnummer or "",
-                        publication_type or "",
-                        publication_date or "",
-                        detail_url or "",
-                    ]
-                    if token
-                )
-            )
 
-            records.append(
-                {
-                    "evi_key": build_evi_key(detail_url, company_name, publication_date),
-                    "publication_date": publication_date,
-                    "publication_type": publication_type,
-                    "detail_url": detail_url,
-                    "source_item_path": as_text(row.get("source_item_path")),
-                    "source_search_url": as_text(row.get("source_search_url")),
-                    "company_name": company_name,
-                    "company_name_norm": company_name_norm,
-                    "firmenbuchnummer": firmenbuchnummer,
-                    "search_text": search_text,
-                    "crawled_at": crawled_at,
-                    "raw_row": row,
-                }
+def prepare_range(path: str, start: int, end: int) -> tuple[list[dict[str, Any]], int]:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        return prepare_lines(fh.read(end - start).split(b"\n"))
+
+
+def prepare_lines(lines: Iterable[bytes]) -> tuple[list[dict[str, Any]], int]:
+    records: list[dict[str, Any]] = []
+    skipped = 0
+    # Both parsers take the raw line bytes, so lines are never decoded to str first.
+    loads = orjson.loads if orjson is not None else json.loads
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = loads(line)
+        except ValueError:
+            skipped += 1
+            continue
+
+        detail_url = as_text(row.get("detail_url"))
+        company_name = as_text(row.get("company_name"))
+        if not detail_url and not company_name:
+            skipped += 1
+            continue
+
+        publication_type = as_text(row.get("publication_type"))
+        firmenbuchnummer = as_text(row.get("firmenbuchnummer"))
+        publication_date = to_iso_date(row.get("publication_date"))
+        crawled_at = to_iso_timestamptz(row.get("crawled_at"))
+        company_name_norm = normalize_text(company_name)
+
+        # Normalizing token by token equals normalizing the space-joined string, and lets the
+        # repeating tokens hit the cache.
+        search_text = " ".join(
+            token
+            for token in (
+                company_name_norm,
+                normalize_text(firmenbuchnummer),
+                normalize_text(publication_type),
+                normalize_text(publication_date),
+                _normalize_text(detail_url or ""),
             )
+            if token
+        )
+
+        records.append(
+            {
+                "evi_key": build_evi_key(detail_url, company_name, publication_date),
+                "publication_date": publication_date,
+                "publication_type": publication_type,
+                "detail_url": detail_url,
+                "source_item_path": as_text(row.get("source_item_path")),
+                "source_search_url": as_text(row.get("source_search_url")),
+                "company_name": company_name,
+                "company_name_norm": company_name_norm,
+                "firmenbuchnummer": firmenbuchnummer,
+                "search_text": search_text,
+                "crawled_at": crawled_at,
+                "raw_row": row,
+            }
+        )
     return records, skipped
 
 
-def batch_upsert(client: Client, records: list[dict[str, Any]], batch_size: int) -> int:
-    total = 0
-    for idx in range(0, len(records), batch_size):
-        batch = records[idx : idx + batch_size]
+def batch_upsert(client: Client, records: list[dict[str, Any]], batch_size: int, concurrency: int = 4) -> int:
+    # Last row per evi_key wins, as with sequential batches; it also keeps concurrent batches from
+    # contending for the same row and a single batch from hitting one key twice.
+    records = list({record["evi_key"]: record for record in records}.values())
+    batches = [records[idx : idx + batch_size] for idx in range(0, len(records), batch_size)]
+
+    def upsert(batch: list[dict[str, Any]]) -> int:
         client.table("evi_bilanz_publications").upsert(batch, on_conflict="evi_key").execute()
-        total += len(batch)
-        print(f"Upserted batch {idx // batch_size + 1}: {len(batch)} rows")
+        return len(batch)
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(upsert, batch): batch_no for batch_no, batch in enumerate(batches, start=1)}
+        for future in as_completed(futures):
+            count = future.result()
+            total += count
+            print(f"Upserted batch {futures[future]}: {count} rows")
     return total
 
 
@@ -238,6 +321,7 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Import EVI Bilanz JSONL into Supabase")
     parser.add_argument("--jsonl", type=str, default=None, help="Path to evi_bilanz.jsonl")
     parser.add_argument("--batch-size", type=int, default=500, help="Rows per upsert batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="Upsert batches in flight at once")
     return parser.parse_args()
 
 
@@ -256,7 +340,7 @@ def main() -> None:
         print(f"Rows skipped (invalid JSON/empty): {skipped}")
 
     if records:
-        upserted = batch_upsert(client, records, max(1, args.batch_size))
+        upserted = batch_upsert(client, records, max(1, args.batch_size), max(1, args.concurrency))
     else:
         upserted = 0
 
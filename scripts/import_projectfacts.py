@@ -3,16 +3,25 @@ from __future__ import annotations
 
 import argparse
 import hashlib
+import json
 import os
 import re
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
 import pandas as pd
 from dotenv import find_dotenv, load_dotenv
+from openpyxl import load_workbook
 from supabase import Client, create_client
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
 REQUIRED_CANONICAL_FIELDS = ("name", "street", "plz", "city", "country")
 
 COLUMN_ALIASES: dict[str, tuple[str, ...]] = {
@@ -32,6 +41,23 @@ COLUMN_ALIASES: dict[str, tuple[str, ...]] = {
     "raw_addresses": ("Adressen",),
 }
 
+# Canonical fields read as text / as timestamps, in the order prepare_records unpacks them.
+TEXT_FIELDS = (
+    "name",
+    "ort",
+    "street",
+    "plz",
+    "city",
+    "state",
+    "country",
+    "segment_country",
+    "industries",
+    "size",
+    "company_address",
+    "raw_addresses",
+)
+TIMESTAMP_FIELDS = ("last_changed", "last_activity")
+
 UMLAUT_TRANSLATION = str.maketrans(
     {
         "ä": "ae",
@@ -44,16 +70,54 @@ UMLAUT_TRANSLATION = str.maketrans(
     }
 )
 SCHEMA_SQL_PATH = Path(__file__).resolve().parent / "setup_projectfacts_schema.sql"
+EXCEL_CHUNK_ROWS = 50_000
+MAX_UPSERT_PAYLOAD_BYTES = 4 * 1024 * 1024
+# pd.read_excel's default na_values: text cells that read exactly like this were imported as NaN.
+EXCEL_NA_STRINGS = frozenset(
+    {
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NULL",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+    }
+)
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
 
 def normalize_text(value: Any) -> str:
     if value is None or pd.isna(value):
         return ""
-    text = str(value).replace("_x000D_", "\n").strip().lower().translate(UMLAUT_TRANSLATION)
+    return _normalize_text_cached(str(value))
+
+
+def _normalize_text(text: str) -> str:
+    text = text.replace("_x000D_", "\n").strip().lower().translate(UMLAUT_TRANSLATION)
     text = unicodedata.normalize("NFKD", text)
     text = "".join(ch for ch in text if not unicodedata.combining(ch))
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    text = _NON_ALNUM_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+# Names, cities, countries, industries and sizes repeat heavily across the sheet; the per-row
+# address and search_text concatenations do not and bypass the cache.
+_normalize_text_cached = lru_cache(maxsize=65536)(_normalize_text)
 
 
 def as_text(value: Any) -> str | None:
@@ -78,7 +142,7 @@ def to_iso_timestamptz(value: Any) -> str | None:
 
 def build_address_norm(street: str, plz: str, city: str, country: str) -> str:
     parts = [street, plz, city, country]
-    return normalize_text(" ".join(part for part in parts if part))
+    return _normalize_text(" ".join(part for part in parts if part))
 
 
 def build_pf_key(name_norm: str, address_norm: str) -> str:
@@ -197,28 +261,83 @@ def locate_excel(explicit_path: str | None = None) -> Path:
     )
 
 
-def prepare_records(df: pd.DataFrame) -> tuple[list[dict[str, Any]], int]:
+def excel_header(values: tuple[Any, ...]) -> list[str]:
+    # Same labels pd.read_excel would produce: stripped names, "Unnamed: i" for blanks, ".n" suffixes for duplicates.
+    header: list[str] = []
+    seen: dict[str, int] = {}
+    for idx, value in enumerate(values):
+        label = str(value).strip() if value is not None else f"Unnamed: {idx}"
+        count = seen.get(label, 0)
+        seen[label] = count + 1
+        header.append(f"{label}.{count}" if count else label)
+    return header
+
+
+def iter_excel_chunks(excel_path: Path, chunk_rows: int = EXCEL_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    # Stream the first sheet in read-only mode instead of loading the whole workbook with pd.read_excel.
+    # Cells stay as openpyxl returns them (dtype=object), so values do not depend on where a chunk starts.
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = excel_header(next(rows, ()))
+        width = len(header)
+        chunk: list[tuple[Any, ...]] = []
+        yielded = False
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            cells = tuple(None if isinstance(value, str) and value in EXCEL_NA_STRINGS else value for value in row[:width])
+            chunk.append(cells + (None,) * (width - len(cells)))
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame(chunk, columns=header, dtype=object)
+                yielded = True
+                chunk = []
+        if chunk or not yielded:
+            yield pd.DataFrame(chunk, columns=header, dtype=object)
+    finally:
+        workbook.close()
+
+
+def prepare_records(
+    df: pd.DataFrame,
+    pf_key_occurrences: dict[str, int] | None = None,
+) -> tuple[list[dict[str, Any]], int]:
     columns = resolve_columns(df)
     records: list[dict[str, Any]] = []
     skipped = 0
-    pf_key_occurrences: dict[str, int] = {}
+    # Shared across chunks so duplicate rows get the same pf_key suffixes as a whole-sheet pass.
+    if pf_key_occurrences is None:
+        pf_key_occurrences = {}
+
+    # Convert column by column instead of materializing a Series per row with iterrows().
+    def column_values(key: str) -> list[Any]:
+        return df[columns[key]].tolist() if key in columns else [None] * len(df)
+
+    text_columns = zip(*([as_text(value) for value in column_values(key)] for key in TEXT_FIELDS))
+    timestamp_columns = zip(*([to_iso_timestamptz(value) for value in column_values(key)] for key in TIMESTAMP_FIELDS))
+    raw_keys = [str(col) for col in df.columns]
+    raw_columns = zip(
+        *(
+            [None if pd.isna(value) else str(value).replace("_x000D_", "\n") for value in df.iloc[:, idx].tolist()]
+            for idx in range(df.shape[1])
+        )
+    )
 
-    for _, row in df.iterrows():
-        get = lambda key: row[columns[key]] if key in columns else None
-        name = as_text(get("name"))
-        ort = as_text(get("ort"))
-        street = as_text(get("street"))
-        plz = as_text(get("plz"))
-        city = as_text(get("city"))
-        state = as_text(get("state"))
-        country = as_text(get("country"))
-        segment_country = as_text(get("segment_country"))
-        industries = as_text(get("industries"))
-        size = as_text(get("size"))
-        company_address = as_text(get("company_address"))
-        raw_addresses = as_text(get("raw_addresses"))
-        last_changed_at = to_iso_timestamptz(get("last_changed"))
-        last_activity_at = to_iso_timestamptz(get("last_activity"))
+    for text_values, (last_changed_at, last_activity_at), raw_values in zip(text_columns, timestamp_columns, raw_columns):
+        (
+            name,
+            ort,
+            street,
+            plz,
+            city,
+            state,
+            country,
+            segment_country,
+            industries,
+            size,
+            company_address,
+            raw_addresses,
+        ) = text_values
 
         name_norm = normalize_text(name)
         city_norm = normalize_text(city)
@@ -235,7 +354,7 @@ def prepare_records(df: pd.DataFrame) -> tuple[list[dict[str, Any]], int]:
         occurrence = pf_key_occurrences.get(pf_key_base, 0) + 1
         pf_key_occurrences[pf_key_base] = occurrence
         pf_key = uniquify_pf_key(pf_key_base, occurrence)
-        search_text = normalize_text(
+        search_text = _normalize_text(
             " ".join(
                 value
                 for value in [
@@ -255,10 +374,7 @@ def prepare_records(df: pd.DataFrame) -> tuple[list[dict[str, Any]], int]:
             )
         )
 
-        raw_row = {
-            str(col): (None if pd.isna(row[col]) else str(row[col]).replace("_x000D_", "\n"))
-            for col in df.columns
-        }
+        raw_row = dict(zip(raw_keys, raw_values))
 
         records.append(
             {
@@ -288,13 +404,39 @@ def prepare_records(df: pd.DataFrame) -> tuple[list[dict[str, Any]], int]:
     return records, skipped
 
 
-def batch_upsert(client: Client, records: list[dict[str, Any]], batch_size: int) -> int:
-    total = 0
-    for idx in range(0, len(records), batch_size):
-        batch = records[idx : idx + batch_size]
+def upsert_payload_bytes(batch: list[dict[str, Any]]) -> int:
+    if orjson is not None:
+        return len(orjson.dumps(batch))
+    return len(json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def split_oversized_batch(batch: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    # Bisect until each request body fits under the PostgREST payload limit; a single row is sent as is.
+    if len(batch) <= 1 or upsert_payload_bytes(batch) <= MAX_UPSERT_PAYLOAD_BYTES:
+        return [batch]
+    mid = len(batch) // 2
+    return split_oversized_batch(batch[:mid]) + split_oversized_batch(batch[mid:])
+
+
+def batch_upsert(client: Client, records: list[dict[str, Any]], batch_size: int, concurrency: int = 4) -> int:
+    # pf_keys are already unique (duplicates get a dup:n suffix), so concurrent batches never touch the same row.
+    batches = [
+        part
+        for idx in range(0, len(records), batch_size)
+        for part in split_oversized_batch(records[idx : idx + batch_size])
+    ]
+
+    def upsert(batch: list[dict[str, Any]]) -> int:
         client.table("projectfacts").upsert(batch, on_conflict="pf_key").execute()
-        total += len(batch)
-        print(f"Upserted batch {idx // batch_size + 1}: {len(batch)} rows")
+        return len(batch)
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(upsert, batch): batch_no for batch_no, batch in enumerate(batches, start=1)}
+        for future in as_completed(futures):
+            count = future.result()
+            total += count
+            print(f"Upserted batch {futures[future]}: {count} rows")
     return total
 
 
@@ -321,7 +463,13 @@ def create_client_from_env() -> Client:
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Import projectfacts.xlsx into Supabase")
     parser.add_argument("--excel-path", type=str, default=None, help="Path to projectfacts.xlsx")
-    parser.add_argument("--batch-size", type=int, default=500, help="Rows per upsert batch")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Rows per upsert batch; fewer, larger requests are faster, and batches over ~4 MiB of JSON are split",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Upsert batches in flight at once")
     parser.add_argument(
         "--append",
         action="store_true",
@@ -339,25 +487,35 @@ def main() -> None:
     ensure_projectfacts_table_ready(client)
     print("Schema preflight passed: projectfacts table is reachable.")
 
-    df = pd.read_excel(excel_path, engine="openpyxl")
-    df = df.rename(columns=lambda c: str(c).strip())
-    resolve_columns(df)
-    print(f"Rows loaded from Excel: {len(df)}")
-
-    records, skipped = prepare_records(df)
-    print(f"Rows prepared for upsert: {len(records)}")
-    if skipped:
-        print(f"Rows skipped (empty name and address): {skipped}")
+    pf_key_occurrences: dict[str, int] = {}
+    chunks = iter_excel_chunks(excel_path)
+    # Header check and the first chunk are done before anything is deleted. A later chunk that fails
+    # still leaves a partial full refresh behind; rerun the import to complete it.
+    df = next(chunks)
+    records, skipped = prepare_records(df, pf_key_occurrences)
+    loaded = len(df)
+    prepared = len(records)
 
     if not args.append:
         deleted = replace_all_rows(client)
         print(f"Existing rows deleted for full refresh: {deleted}")
 
-    if records:
-        upserted = batch_upsert(client, records, max(1, args.batch_size))
-    else:
-        upserted = 0
-
+    upserted = 0
+    while True:
+        if records:
+            upserted += batch_upsert(client, records, max(1, args.batch_size), max(1, args.concurrency))
+        df = next(chunks, None)
+        if df is None:
+            break
+        loaded += len(df)
+        records, chunk_skipped = prepare_records(df, pf_key_occurrences)
+        prepared += len(records)
+        skipped += chunk_skipped
+
+    print(f"Rows loaded from Excel: {loaded}")
+    print(f"Rows prepared for upsert: {prepared}")
+    if skipped:
+        print(f"Rows skipped (empty name and address): {skipped}")
     print(f"Rows upserted: {upserted}")
     print("Import finished successfully.")
 
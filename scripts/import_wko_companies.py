@@ -7,13 +7,20 @@ import json
 import os
 import re
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
 from dotenv import find_dotenv, load_dotenv
 from supabase import Client, create_client
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
 SCHEMA_SQL_PATH = Path(__file__).resolve().parent / "setup_wko_schema.sql"
 DEFAULT_COMPANY_JSONL_CANDIDATES = (
     Path("data/out/companies_continuous.jsonl"),
@@ -21,6 +28,7 @@ DEFAULT_COMPANY_JSONL_CANDIDATES = (
     Path("data/out/companies_on_demand.jsonl"),
 )
 DEFAULT_BRANCH_CATALOG = Path("data/wko_branch_catalog.json")
+MAX_UPSERT_PAYLOAD_BYTES = 4 * 1024 * 1024
 
 UMLAUT_TRANSLATION = str.maketrans(
     {
@@ -35,15 +43,27 @@ UMLAUT_TRANSLATION = str.maketrans(
 )
 
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
 def normalize_text(value: Any) -> str:
     if value is None:
         return ""
-    text = str(value).strip().lower().translate(UMLAUT_TRANSLATION)
+    return _normalize_text_cached(str(value))
+
+
+def _normalize_text(text: str) -> str:
+    text = text.strip().lower().translate(UMLAUT_TRANSLATION)
     text = unicodedata.normalize("NFKD", text)
     text = "".join(ch for ch in text if not unicodedata.combining(ch))
-    text = re.sub(r"[^a-z0-9\s]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    text = _NON_ALNUM_RE.sub(" ", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+# Companies are listed under every branch they belong to, so names and addresses repeat across the
+# JSONL; the per-row search_text concatenation does not and bypasses the cache.
+_normalize_text_cached = lru_cache(maxsize=65536)(_normalize_text)
 
 
 def as_text(value: Any) -> str | None:
@@ -197,7 +217,7 @@ def prepare_company_records(companies_jsonl_path: Path) -> tuple[list[dict[str,
                 skipped += 1
                 continue
 
-            search_text = normalize_text(
+            search_text = _normalize_text(
                 " ".join(
                     x
                     for x in [
@@ -256,13 +276,50 @@ def prepare_branch_records(branch_catalog_path: Path) -> list[dict[str, Any]]:
     return out
 
 
-def batch_upsert(client: Client, table: str, records: list[dict[str, Any]], on_conflict: str, batch_size: int) -> int:
-    total = 0
-    for idx in range(0, len(records), batch_size):
-        batch = records[idx : idx + batch_size]
+def upsert_payload_bytes(batch: list[dict[str, Any]]) -> int:
+    if orjson is not None:
+        return len(orjson.dumps(batch))
+    return len(json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def split_oversized_batch(batch: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    # Bisect until each request body fits under the PostgREST payload limit; a single row is sent as is.
+    if len(batch) <= 1 or upsert_payload_bytes(batch) <= MAX_UPSERT_PAYLOAD_BYTES:
+        return [batch]
+    mid = len(batch) // 2
+    return split_oversized_batch(batch[:mid]) + split_oversized_batch(batch[mid:])
+
+
+def batch_upsert(
+    client: Client,
+    table: str,
+    records: list[dict[str, Any]],
+    on_conflict: str,
+    batch_size: int,
+    concurrency: int = 4,
+) -> int:
+    # Companies are listed under several branches, so conflict keys repeat. Last row per key wins, as with
+    # sequential batches; it also keeps concurrent batches from contending for the same row and a single
+    # batch from hitting one key twice.
+    conflict_columns = on_conflict.split(",")
+    records = list({tuple(record[col] for col in conflict_columns): record for record in records}.values())
+    batches = [
+        part
+        for idx in range(0, len(records), batch_size)
+        for part in split_oversized_batch(records[idx : idx + batch_size])
+    ]
+
+    def upsert(batch: list[dict[str, Any]]) -> int:
         client.table(table).upsert(batch, on_conflict=on_conflict).execute()
-        total += len(batch)
-        print(f"{table}: upserted batch {idx // batch_size + 1} ({len(batch)} rows)")
+        return len(batch)
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(upsert, batch): batch_no for batch_no, batch in enumerate(batches, start=1)}
+        for future in as_completed(futures):
+            count = future.result()
+            total += count
+            print(f"{table}: upserted batch {futures[future]} ({count} rows)")
     return total
 
 
@@ -280,7 +337,13 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Path to wko_branch_catalog.json (defaults to data/wko_branch_catalog.json if present)",
     )
-    parser.add_argument("--batch-size", type=int, default=500, help="Rows per upsert batch")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Rows per upsert batch; fewer, larger requests are faster, and batches over ~4 MiB of JSON are split",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Upsert batches in flight at once")
     parser.add_argument(
         "--companies-only",
         action="store_true",
@@ -315,6 +378,7 @@ def main() -> None:
             records=company_records,
             on_conflict="wko_key",
             batch_size=max(1, args.batch_size),
+            concurrency=max(1, args.concurrency),
         )
     else:
         upserted_companies = 0
@@ -330,6 +394,7 @@ def main() -> None:
                 records=branch_records,
                 on_conflict="branche,branch_url",
                 batch_size=max(1, args.batch_size),
+                concurrency=max(1, args.concurrency),
             )
 
     print(f"Rows upserted into wko_companies: {upserted_companies}")
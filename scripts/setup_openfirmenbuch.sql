@@ -485,3 +485,155 @@ on ofb_financial_years (firmennummer, gj_ende desc);
 
 create index if not exists ofb_company_source_links_firmennummer_idx
 on ofb_company_source_links (firmennummer);
+
+-- rpc: clear every child table of one snapshot in a single round trip.
+create or replace function ofb_delete_snapshot_children(sid uuid)
+returns void
+language sql
+as $$
+  with d_vollz as (delete from ofb_auszug_vollz where snapshot_id = sid),
+       d_euid as (delete from ofb_auszug_euid where snapshot_id = sid),
+       d_fun as (delete from ofb_auszug_fun where snapshot_id = sid),
+       d_per as (delete from ofb_auszug_per where snapshot_id = sid),
+       d_dkz02 as (delete from ofb_auszug_firma_dkz02 where snapshot_id = sid),
+       d_dkz03 as (delete from ofb_auszug_firma_dkz03 where snapshot_id = sid),
+       d_dkz06 as (delete from ofb_auszug_firma_dkz06 where snapshot_id = sid)
+  delete from ofb_auszug_firma_dkz07 where snapshot_id = sid
+$$;
+
+-- rpc: upsert one batch of already-mapped rows into a financial child table keyed by financial_year_id.
+create or replace function ofb_upsert_financial_rows(p_table text, p_rows jsonb)
+returns void
+language plpgsql
+as $$
+declare
+  col_list text;
+  set_list text;
+begin
+  -- Exposed as an rpc: only the four financial child tables may be written through it.
+  if p_table not in (
+    'ofb_financial_bilanz',
+    'ofb_financial_guv',
+    'ofb_financial_kennzahlen_bilanz',
+    'ofb_financial_kennzahlen_guv'
+  ) then
+    raise exception 'ofb_upsert_financial_rows: table % is not a financial child table', p_table;
+  end if;
+  if p_rows is null or jsonb_array_length(p_rows) = 0 then
+    return;
+  end if;
+  select string_agg(quote_ident(k), ', '),
+         string_agg(format('%I = excluded.%I', k, k), ', ') filter (where k <> 'financial_year_id')
+    into col_list, set_list
+    from jsonb_object_keys(p_rows -> 0) as k;
+  execute format(
+    'insert into %1$I (%2$s) select %2$s from jsonb_populate_recordset(null::%1$I, $1) '
+    'on conflict (financial_year_id) do update set %3$s',
+    p_table, col_list, set_list
+  ) using p_rows;
+end
+$$;
+
+-- rpc: all four financial child tables of one company in a single round trip and transaction.
+create or replace function ofb_upsert_financial_children(
+  p_bilanz jsonb,
+  p_guv jsonb,
+  p_kennzahlen_bilanz jsonb,
+  p_kennzahlen_guv jsonb
+)
+returns void
+language plpgsql
+as $$
+begin
+  perform ofb_upsert_financial_rows('ofb_financial_bilanz', p_bilanz);
+  perform ofb_upsert_financial_rows('ofb_financial_guv', p_guv);
+  perform ofb_upsert_financial_rows('ofb_financial_kennzahlen_bilanz', p_kennzahlen_bilanz);
+  perform ofb_upsert_financial_rows('ofb_financial_kennzahlen_guv', p_kennzahlen_guv);
+end
+$$;
+
+-- rpc: claim due queue items atomically; concurrent crawlers skip rows another one already locked.
+-- Replaces the earlier one-argument version so the rpc name stays unambiguous.
+drop function if exists ofb_claim_queue(int);
+create or replace function ofb_claim_queue(p_batch int, p_lease_minutes int)
+returns setof ofb_crawl_queue
+language sql
+as $$
+  with due as (
+    select id
+    from ofb_crawl_queue
+    where status in ('pending', 'failed')
+      and next_run_at <= now()
+    order by priority, next_run_at
+    limit p_batch
+    for update skip locked
+  )
+  update ofb_crawl_queue q
+  -- Lease: the row is not due again for p_lease_minutes, even if a re-seed flips it back to pending
+  -- while it is still being crawled.
+  set status = 'running',
+      last_run_at = now(),
+      next_run_at = now() + make_interval(mins => p_lease_minutes),
+      updated_at = now()
+  from due
+  where q.id = due.id
+  returning q.*
+$$;
+
+-- rpc: finish one crawled queue item (company, source link, queue row) in a single round trip and transaction.
+create or replace function ofb_finalize_crawl(p_company jsonb, p_link jsonb, p_queue_id uuid, p_queue jsonb)
+returns void
+language plpgsql
+as $$
+declare
+  col_list text;
+  set_list text;
+begin
+  if p_company is not null and p_company <> 'null'::jsonb then
+    -- Only the keys sent are written, so a bare refresh keeps the search-derived columns.
+    select string_agg(quote_ident(k), ', '),
+           string_agg(format('%I = excluded.%I', k, k), ', ') filter (where k <> 'firmennummer')
+      into col_list, set_list
+      from jsonb_object_keys(p_company) as k;
+    execute format(
+      'insert into ofb_companies (%1$s) select %1$s from jsonb_populate_record(null::ofb_companies, $1) '
+      'on conflict (firmennummer) do update set %2$s',
+      col_list, set_list
+    ) using p_company;
+  end if;
+
+  insert into ofb_company_source_links (firmennummer, source_system, source_key, source_name, confidence, matched_at)
+  select firmennummer, source_system, source_key, source_name, confidence, matched_at
+  from jsonb_populate_record(null::ofb_company_source_links, p_link)
+  on conflict (source_system, source_key) do update
+  set firmennummer = excluded.firmennummer,
+      source_name = excluded.source_name,
+      confidence = excluded.confidence,
+      matched_at = excluded.matched_at;
+
+  update ofb_crawl_queue q
+  set firmennummer = r.firmennummer,
+      status = r.status,
+      attempts = r.attempts,
+      last_run_at = r.last_run_at,
+      next_run_at = r.next_run_at,
+      last_error = r.last_error,
+      updated_at = r.updated_at
+  from jsonb_populate_record(null::ofb_crawl_queue, p_queue) as r
+  where q.id = p_queue_id;
+end
+$$;
+
+-- rpc: mark a queue item failed; attempts and backoff are computed from the stored row, not a stale copy.
+create or replace function ofb_mark_failed(p_queue_id uuid, p_error text)
+returns void
+language sql
+as $$
+  update ofb_crawl_queue
+  set status = 'failed',
+      attempts = attempts + 1,
+      last_error = left(p_error, 900),
+      next_run_at = now() + make_interval(mins => least(24 * 60, 10 * power(2, least(6, attempts + 1)))::int),
+      updated_at = now()
+  where id = p_queue_id
+$$;
@@ -0,0 +1,21 @@
+import unittest
+
+from scripts.crawl_openfirmenbuch import split_sql_statements
+
+
+class TestSplitSqlStatements(unittest.TestCase):
+    def test_comments_do_not_join_tokens(self):
+        self.assertEqual(
+            split_sql_statements("select 1--c\nfrom t; select 2/**/from t;"),
+            ["select 1\nfrom t;", "select 2 from t;"],
+        )
+
+    def test_semicolons_inside_quotes_and_comments(self):
+        self.assertEqual(
+            split_sql_statements("select 'a;b'; -- x;y\ncreate function f() as $$ select 1; $$;"),
+            ["select 'a;b';", "create function f() as $$ select 1; $$;"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
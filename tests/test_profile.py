@@ -0,0 +1,21 @@
+import unittest
+
+from mas.profile import match_focus_areas
+
+
+class TestMatchFocusAreas(unittest.TestCase):
+    def test_match_focus_areas(self):
+        hits = match_focus_areas("Predictive Maintenance und Lagerplanung mit FTS")
+        self.assertEqual(
+            hits,
+            [
+                "Ersatzteil- und Instandhaltungsmanagement",
+                "Lagerplanung, Automatisierung und Intralogistik",
+                "Mobile Robotik und FTS",
+            ],
+        )
+        self.assertEqual(match_focus_areas(""), [])
+
+
+if __name__ == "__main__":
+    unittest.main()